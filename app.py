@@ -4,6 +4,10 @@ from config import Config
 from database import db
 from routes.auth import auth_bp
 from routes.pdf import pdf_bp
+from routes.admin import admin_bp
+from utils.profiling import init_profiling
+from utils.memory_watchdog import memory_watchdog
+from utils.health import health_monitor
 
 def create_app():
     """Create and configure Flask app"""
@@ -15,6 +19,13 @@ def create_app():
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(pdf_bp)
+    app.register_blueprint(admin_bp)
+    
+    # Opt-in / sampled request profiling
+    init_profiling(app)
+    
+    # Per-worker memory accounting and recycling
+    memory_watchdog.init_app(app)
     
     # Connect to database
     try:
@@ -22,6 +33,9 @@ def create_app():
     except Exception as e:
         print(f"Warning: Could not connect to MongoDB: {e}")
     
+    # Background dependency checks for the health endpoints
+    health_monitor.start()
+    
     @app.route('/')
     def health_check():
         """Health check endpoint"""
@@ -33,20 +47,24 @@ def create_app():
     
     @app.route('/api/health', methods=['GET'])
     def health():
-        """Detailed health check"""
-        try:
-            # Test database connection
-            db.get_db().command('ping')
-            db_status = 'connected'
-        except:
-            db_status = 'disconnected'
-        
+        """Detailed health check (database status from the cached background probe)"""
         return {
             'status': 'ok',
-            'database': db_status,
+            'database': health_monitor.database_status(),
             'version': '1.0.0'
         }
     
+    @app.route('/api/health/live', methods=['GET'])
+    def liveness():
+        """Liveness probe: the process is up and serving requests"""
+        return {'status': 'ok'}
+    
+    @app.route('/api/health/ready', methods=['GET'])
+    def readiness():
+        """Readiness probe: 503 while a dependency is down or this worker is saturated"""
+        ready, report = health_monitor.readiness()
+        return report, 200 if ready else 503
+    
     return app
 
 if __name__ == '__main__':
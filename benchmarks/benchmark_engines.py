@@ -0,0 +1,69 @@
+"""
+Compare extraction engines on real statements.
+
+Usage:
+    python benchmarks/benchmark_engines.py statement1.pdf [statement2.pdf ...] [--repeat 3]
+
+For every PDF and engine this reports the median wall time, the number of
+rows found, and how many of the tabula rows the other engines agree with
+(same description, amount, date *and* debit/credit column).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.statement_parser import EXTRACTION_ENGINES, extract_statement_rows, normalize_desc
+
+
+def row_keys(rows):
+    """Comparable identity for a row, including which column the amount landed in"""
+    keys = set()
+    for row in rows:
+        desc, debit, credit, date = row['row_data']
+        keys.add((normalize_desc(desc), debit, credit, date))
+    return keys
+
+
+def run(pdf_path, engine, repeat):
+    """Time `repeat` extractions and return (median_seconds, rows)"""
+    timings = []
+    rows = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = extract_statement_rows(pdf_path, pages='all', engine=engine)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdfs', nargs='+', help='statement PDFs to extract')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per engine (median is reported)')
+    parser.add_argument('--engines', default=','.join(EXTRACTION_ENGINES), help='comma-separated engines')
+    args = parser.parse_args()
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    print(f"{'file':<32} {'engine':<8} {'median_s':>9} {'rows':>6} {'agree':>7}")
+    for pdf_path in args.pdfs:
+        results = {}
+        for engine in engines:
+            try:
+                results[engine] = run(pdf_path, engine, args.repeat)
+            except Exception as e:
+                print(f"{os.path.basename(pdf_path):<32} {engine:<8} failed: {e}")
+
+        baseline = row_keys(results['tabula'][1]) if 'tabula' in results else None
+        for engine, (median, rows) in results.items():
+            if baseline:
+                agree = f"{len(row_keys(rows) & baseline) / len(baseline):.0%}"
+            else:
+                agree = '-'
+            print(f"{os.path.basename(pdf_path):<32} {engine:<8} {median:>9.3f} {len(rows):>6} {agree:>7}")
+
+
+if __name__ == '__main__':
+    main()
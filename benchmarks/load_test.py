@@ -0,0 +1,445 @@
+"""
+End-to-end concurrent load test for the auth and PDF endpoints.
+
+Boots the app under gunicorn (gunicorn.conf.py) in a separate process against
+a Mongo stand-in (mongomock by default, or a local mongod via --mongo-uri), so
+the load generator does not share a GIL with the server, and drives a weighted mix of signup, login,
+get-user, upload, get-table-data and convert requests at rising concurrency.
+Reports throughput, latency percentiles and error rates per level, and the
+level at which the node saturates.
+
+Usage:
+    python benchmarks/load_test.py --levels 1,2,4,8,16 --duration 10
+    python benchmarks/load_test.py --mix login=3,convert=1 --pdf statement.pdf
+    python benchmarks/load_test.py --url http://localhost:4000   # existing server
+    python benchmarks/load_test.py --in-process   # werkzeug in this interpreter (quick, not representative)
+    python benchmarks/load_test.py --repeat-ratio 0.8   # 80% of PDF requests may hit caches
+
+Every PDF request sends a unique statement by default (a nonce comment is
+appended after %%EOF), so document and result caches never short-circuit
+the extraction being measured. --repeat-ratio resends the original bytes for
+that share of requests to model repeat conversions.
+
+As a regression gate, --gate-min-rps / --gate-max-p95-ms / --gate-max-error-rate
+make the script exit with status 1 when the gate level misses them.
+"""
+import argparse
+import atexit
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_MIX = 'signup=1,login=3,user=2,upload=1,table=2,convert=1'
+PASSWORD = 'loadtest-password'
+
+# A level saturates when adding concurrency buys less than this much throughput
+SATURATION_GAIN = 0.10
+
+
+# -------------------------
+# Sample statement
+# -------------------------
+def build_sample_statement(pages=2, rows_per_page=25, seed=1):
+    """Build a small text-layer PDF laid out like a bank statement"""
+    rng = random.Random(seed)
+    contents = []
+    balance = 1000.00
+    day = 0
+    for page in range(pages):
+        ops = []
+
+        def text(x, y, value):
+            ops.append(f"BT /F1 9 Tf {x} {y} Td ({value}) Tj ET")
+
+        text(40, 760, "TD CANADA TRUST")
+        text(40, 745, "STATEMENT OF ACCOUNT")
+        for x, header in ((40, "DESCRIPTION"), (250, "CHEQUE/DEBIT"), (340, "DEPOSIT/CREDIT"),
+                          (440, "DATE"), (500, "BALANCE")):
+            text(x, 700, header)
+        y = 680
+        for row in range(rows_per_page):
+            amount = round(rng.uniform(5, 900), 2)
+            is_debit = rng.random() < 0.6
+            balance += -amount if is_debit else amount
+            day += 1
+            month = ["OCT", "NOV", "DEC"][min(day // 28, 2)]
+            text(40, y, rng.choice(["SEND E-TFR", "ATM W/D", "E-DEPOSIT", "PAYROLL DEP"]) + f" {page}-{row}")
+            text(250 if is_debit else 340, y, f"{amount:,.2f}")
+            text(440, y, f"{month}{day % 28 + 1:02d}")
+            text(500, y, f"{balance:,.2f}")
+            y -= 20
+        contents.append("\n".join(ops).encode('latin-1'))
+
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for data in contents:
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+    pages_id = len(objects) + len(contents) + 1
+    page_ids = []
+    for index in range(len(contents)):
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, index + 2))
+        page_ids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                   % (b" ".join(b"%d 0 R" % p for p in page_ids), len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return out
+
+
+# -------------------------
+# HTTP client
+# -------------------------
+def _request(url, method='GET', body=None, headers=None, timeout=60):
+    """Send a request and return (status, body_bytes)"""
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _json_request(url, method, payload, headers=None):
+    headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+    return _request(url, method, json.dumps(payload).encode('utf-8'), headers)
+
+
+def _multipart(filename, data):
+    """Encode a single-file multipart body"""
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode('utf-8') + data + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Scenario:
+    """The request mix, with a pool of registered users to log in as"""
+
+    def __init__(self, base_url, pdf_bytes, engine, repeat_ratio=0.0):
+        self.base_url = base_url.rstrip('/')
+        self.pdf_bytes = pdf_bytes
+        self.engine = engine
+        self.repeat_ratio = repeat_ratio
+        self.users = []
+        self.tokens = []
+        self._lock = threading.Lock()
+
+    def _ok(self, status, expected=(200,)):
+        return status in expected
+
+    def signup(self):
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        status, body = _json_request(f"{self.base_url}/api/auth/user/signup", 'POST',
+                                     {'email': email, 'password': PASSWORD})
+        if status == 201:
+            with self._lock:
+                self.users.append(email)
+                self.tokens.append(json.loads(body)['token'])
+        return self._ok(status, (201,))
+
+    def login(self):
+        email = random.choice(self.users)
+        status, _ = _json_request(f"{self.base_url}/api/auth/user/login", 'POST',
+                                  {'email': email, 'password': PASSWORD})
+        return self._ok(status)
+
+    def user(self):
+        token = random.choice(self.tokens)
+        status, _ = _request(f"{self.base_url}/api/auth/user", headers={'Authorization': f"Bearer {token}"})
+        return self._ok(status)
+
+    def _pdf_payload(self):
+        """The base PDF, or a copy with a unique trailing comment so its hash never repeats"""
+        if random.random() < self.repeat_ratio:
+            return self.pdf_bytes
+        return self.pdf_bytes + f"\n% load-test {uuid.uuid4().hex}\n".encode('ascii')
+
+    def _pdf_post(self, path):
+        body, content_type = _multipart('statement.pdf', self._pdf_payload())
+        headers = {'Authorization': f"Bearer {random.choice(self.tokens)}", 'Content-Type': content_type}
+        status, _ = _request(f"{self.base_url}{path}?engine={self.engine}", 'POST', body, headers)
+        return self._ok(status)
+
+    def upload(self):
+        return self._pdf_post('/api/pdf/upload')
+
+    def table(self):
+        return self._pdf_post('/api/pdf/get-table-data')
+
+    def convert(self):
+        return self._pdf_post('/api/pdf/convert')
+
+
+# -------------------------
+# Load driver
+# -------------------------
+def parse_mix(mix):
+    """'login=3,convert=1' -> [('login', 3.0), ('convert', 1.0)]"""
+    weights = []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        weights.append((name.strip(), float(weight or 1)))
+    return weights
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_level(scenario, weights, concurrency, duration):
+    """Run `concurrency` closed-loop workers for `duration` seconds"""
+    names = [name for name, _ in weights]
+    op_weights = [weight for _, weight in weights]
+    samples = []
+    samples_lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        local = []
+        while time.perf_counter() < stop_at:
+            op = random.choices(names, weights=op_weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(scenario, op)()
+            except Exception:
+                ok = False
+            local.append((op, (time.perf_counter() - started) * 1000, ok))
+        with samples_lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for _, latency, _ in samples]
+    errors = sum(1 for _, _, ok in samples if not ok)
+    per_op = {}
+    for name in names:
+        op_latencies = [latency for op, latency, _ in samples if op == name]
+        if op_latencies:
+            per_op[name] = {
+                'requests': len(op_latencies),
+                'p50_ms': round(percentile(op_latencies, 50), 1),
+                'p95_ms': round(percentile(op_latencies, 95), 1),
+            }
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'mean_ms': round(statistics.mean(latencies), 1) if latencies else 0.0,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'per_op': per_op,
+    }
+
+
+def find_saturation(levels, max_p95_ms=None):
+    """First concurrency whose extra workers stop buying throughput (or blow the p95 budget)"""
+    for previous, current in zip(levels, levels[1:]):
+        gain = (current['throughput_rps'] - previous['throughput_rps']) / max(previous['throughput_rps'], 1e-9)
+        if gain < SATURATION_GAIN or (max_p95_ms and current['p95_ms'] > max_p95_ms):
+            return previous['concurrency']
+    return None
+
+
+# -------------------------
+# Server bootstrap
+# -------------------------
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class GunicornServer:
+    """gunicorn -c gunicorn.conf.py in a child process, the way a node runs in production"""
+
+    def __init__(self, mongo_uri, database_name, workers=None, threads=None):
+        self.root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.port = _free_port()
+        self.log = tempfile.NamedTemporaryFile(prefix='load_test_server_', suffix='.log', delete=False)
+        # mongomock lives inside one process, so every request must reach the same worker
+        if workers is None:
+            workers = 1 if mongo_uri.startswith('mongomock://') else int(os.getenv('WEB_CONCURRENCY', 2))
+        env = dict(os.environ, MONGODB_URI=mongo_uri, DATABASE_NAME=database_name, FLASK_DEBUG='False',
+                   WEB_CONCURRENCY=str(workers))
+        if threads:
+            env['GUNICORN_THREADS'] = str(threads)
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{self.port}",
+             'app:create_app()'],
+            cwd=self.root, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        # Don't leave the server behind if the run exits early
+        atexit.register(self.shutdown)
+
+    def wait_ready(self, timeout=60):
+        stop_at = time.time() + timeout
+        while time.time() < stop_at:
+            if self.process.poll() is not None:
+                break
+            try:
+                if _request(f"{self.base_url}/api/health/live", timeout=2)[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.shutdown()
+        sys.exit(f"gunicorn did not start; see {self.log.name}")
+
+    def shutdown(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.log.close()
+
+
+def start_gunicorn_server(mongo_uri, database_name, workers=None, threads=None):
+    """Boot the app under gunicorn in a child process; returns (base_url, server)"""
+    server = GunicornServer(mongo_uri, database_name, workers, threads)
+    server.wait_ready()
+    return server.base_url, server
+
+
+def start_local_server(mongo_uri, database_name):
+    """Boot create_app() in this interpreter on a free local port; returns (base_url, server)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from config import Config
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    Config.MONGODB_URI = mongo_uri
+    Config.DATABASE_NAME = database_name
+    Config.DEBUG = False
+
+    from app import create_app
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='target an already running server instead of booting one')
+    parser.add_argument('--in-process', action='store_true',
+                        help='serve from this interpreter (werkzeug) instead of a gunicorn child process; '
+                             'client and server then share the GIL')
+    parser.add_argument('--workers', type=int, help='gunicorn workers (default: 1 with mongomock, else WEB_CONCURRENCY)')
+    parser.add_argument('--threads', type=int, help='gunicorn threads per worker (default: GUNICORN_THREADS)')
+    parser.add_argument('--mongo-uri', default='mongomock://', help="'mongomock://' or e.g. mongodb://localhost:27017/")
+    parser.add_argument('--database', default='pdf_converter_loadtest')
+    parser.add_argument('--levels', default='1,2,4,8,16', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'weighted request mix (default: {DEFAULT_MIX})')
+    parser.add_argument('--pdf', help='statement PDF to upload (default: generated sample)')
+    parser.add_argument('--engine', default='layout', help='extraction engine for PDF requests')
+    parser.add_argument('--repeat-ratio', type=float, default=0.0,
+                        help='share of PDF requests that resend identical bytes (cache hits); default 0')
+    parser.add_argument('--seed-users', type=int, default=5, help='users registered before the run')
+    parser.add_argument('--max-p95-ms', type=float, help='p95 above this counts as saturated')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--gate-level', type=int, help='concurrency level the gate checks (default: highest)')
+    parser.add_argument('--gate-min-rps', type=float)
+    parser.add_argument('--gate-max-p95-ms', type=float)
+    parser.add_argument('--gate-max-error-rate', type=float)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        if args.in_process:
+            base_url, server = start_local_server(args.mongo_uri, args.database)
+        else:
+            base_url, server = start_gunicorn_server(args.mongo_uri, args.database, args.workers, args.threads)
+
+    if args.pdf:
+        with open(args.pdf, 'rb') as pdf_file:
+            pdf_bytes = pdf_file.read()
+    else:
+        pdf_bytes = build_sample_statement()
+
+    scenario = Scenario(base_url, pdf_bytes, args.engine, args.repeat_ratio)
+    for _ in range(args.seed_users):
+        if not scenario.signup():
+            sys.exit(f"Could not register seed users against {base_url}")
+
+    weights = parse_mix(args.mix)
+    unknown = [name for name, _ in weights if not hasattr(scenario, name) or name.startswith('_')]
+    if unknown:
+        sys.exit(f"Unknown request types in --mix: {', '.join(unknown)}")
+
+    levels = []
+    print(f"{'conc':>5} {'reqs':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for concurrency in [int(level) for level in args.levels.split(',')]:
+        result = run_level(scenario, weights, concurrency, args.duration)
+        levels.append(result)
+        print(f"{result['concurrency']:>5} {result['requests']:>7} {result['throughput_rps']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['error_rate']:>7.2%}")
+
+    saturation = find_saturation(levels, args.max_p95_ms)
+    print(f"Saturation point: {saturation if saturation else 'not reached'}")
+    for name, op in levels[-1]['per_op'].items():
+        print(f"  {name:<8} {op['requests']:>6} reqs  p50 {op['p50_ms']:>8.1f} ms  p95 {op['p95_ms']:>8.1f} ms")
+
+    report = {'base_url': base_url, 'mix': args.mix, 'repeat_ratio': args.repeat_ratio, 'levels': levels,
+              'saturation_concurrency': saturation}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as out:
+            json.dump(report, out, indent=2)
+
+    if server is not None:
+        server.shutdown()
+
+    # Regression gate
+    gate = next((l for l in levels if l['concurrency'] == args.gate_level), levels[-1])
+    failures = []
+    if args.gate_min_rps is not None and gate['throughput_rps'] < args.gate_min_rps:
+        failures.append(f"throughput {gate['throughput_rps']} rps < {args.gate_min_rps}")
+    if args.gate_max_p95_ms is not None and gate['p95_ms'] > args.gate_max_p95_ms:
+        failures.append(f"p95 {gate['p95_ms']} ms > {args.gate_max_p95_ms}")
+    if args.gate_max_error_rate is not None and gate['error_rate'] > args.gate_max_error_rate:
+        failures.append(f"error rate {gate['error_rate']} > {args.gate_max_error_rate}")
+    if failures:
+        print(f"GATE FAILED at concurrency {gate['concurrency']}: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,9 +12,73 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this-in-production')
     JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
     JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', 24))
+    # How often each worker refreshes its copy of the revoked token list
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', 30))
+    # Token checks never wait longer than this on MongoDB
+    TOKEN_REVOCATION_TIMEOUT_MS = int(os.getenv('TOKEN_REVOCATION_TIMEOUT_MS', 500))
+    
+    # Admin Configuration (admin endpoints are disabled while this is empty)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
     
     # Flask Configuration
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     PORT = int(os.getenv('PORT', 4000))
-
+    
+    # PDF Extraction Configuration
+    # 'tabula' (Java) or 'layout' (pure-Python, glyph positions via PyPDF2)
+    PDF_EXTRACTION_ENGINE = os.getenv('PDF_EXTRACTION_ENGINE', 'tabula')
+    # Optional JSON file with extra bank layout profiles (see utils/bank_profiles.py)
+    BANK_PROFILES_FILE = os.getenv('BANK_PROFILES_FILE', '')
+    
+    # Upload probe / document handle Configuration
+    PROBE_BUDGET_MS = int(os.getenv('PROBE_BUDGET_MS', 250))
+    # Document blobs: 'local' (DOCUMENT_SPOOL_DIR) or 'gridfs' (cached locally in DOCUMENT_SPOOL_DIR)
+    DOCUMENT_STORE = os.getenv('DOCUMENT_STORE', 'local').lower()
+    DOCUMENT_SPOOL_DIR = os.getenv('DOCUMENT_SPOOL_DIR', '')
+    DOCUMENT_TTL_SECONDS = int(os.getenv('DOCUMENT_TTL_SECONDS', 3600))
+    # Per-user limits enforced by the background cleanup
+    DOCUMENT_MAX_COUNT = int(os.getenv('DOCUMENT_MAX_COUNT', 200))
+    DOCUMENT_USER_QUOTA_BYTES = int(os.getenv('DOCUMENT_USER_QUOTA_BYTES', 500 * 1024 * 1024))
+    DOCUMENT_CLEANUP_SECONDS = int(os.getenv('DOCUMENT_CLEANUP_SECONDS', 300))
+    
+    # Chunked upload Configuration
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+    UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+    UPLOAD_SESSION_TTL_SECONDS = int(os.getenv('UPLOAD_SESSION_TTL_SECONDS', 6 * 3600))
+    
+    # Stored conversion results (content-addressed, served with ETag)
+    RESULT_STORE_DIR = os.getenv('RESULT_STORE_DIR', '')
+    RESULT_STORE_MAX_BYTES = int(os.getenv('RESULT_STORE_MAX_BYTES', 500 * 1024 * 1024))
+    RESULT_CACHE_MAX_AGE = int(os.getenv('RESULT_CACHE_MAX_AGE', 86400))
+    
+    # Profiling Configuration
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+    PROFILE_MAX_COUNT = int(os.getenv('PROFILE_MAX_COUNT', 50))
+    PROFILE_MAX_BYTES = int(os.getenv('PROFILE_MAX_BYTES', 50 * 1024 * 1024))
+    
+    # Worker memory watchdog (0 disables a limit)
+    WORKER_MAX_RSS_MB = int(os.getenv('WORKER_MAX_RSS_MB', 0))
+    WORKER_MAX_REQUESTS = int(os.getenv('WORKER_MAX_REQUESTS', 0))
+    WORKER_RECLAIM_MB = int(os.getenv('WORKER_RECLAIM_MB', 64))
+    # Set by gunicorn.conf.py; without a master to respawn workers, limits only log
+    WORKER_SUPERVISED = os.getenv('WORKER_SUPERVISED', 'False').lower() in ('true', '1', 'yes')
+    # Readiness reports a worker saturated at this many concurrent requests (0 disables);
+    # defaults to the worker's thread count, past which requests only queue
+    WORKER_MAX_INFLIGHT = int(os.getenv('WORKER_MAX_INFLIGHT', os.getenv('GUNICORN_THREADS', 4)))
+    
+    # Health probe Configuration (checks run in the background)
+    HEALTH_REFRESH_SECONDS = float(os.getenv('HEALTH_REFRESH_SECONDS', 5))
+    HEALTH_JAVA_REFRESH_SECONDS = float(os.getenv('HEALTH_JAVA_REFRESH_SECONDS', 60))
+    HEALTH_MONGO_TIMEOUT_MS = int(os.getenv('HEALTH_MONGO_TIMEOUT_MS', 2000))
+    
+    # Per-endpoint processing deadlines in seconds (0 disables)
+    CONVERT_DEADLINE_SECONDS = float(os.getenv('CONVERT_DEADLINE_SECONDS', 120))
+    TABLE_DATA_DEADLINE_SECONDS = float(os.getenv('TABLE_DATA_DEADLINE_SECONDS', 30))
+    UPLOAD_DEADLINE_SECONDS = float(os.getenv('UPLOAD_DEADLINE_SECONDS', 60))
+    
+    # Conversion audit log (write-behind batches)
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 100))
+    AUDIT_FLUSH_SECONDS = float(os.getenv('AUDIT_FLUSH_SECONDS', 5))
+    AUDIT_BUFFER_LIMIT = int(os.getenv('AUDIT_BUFFER_LIMIT', 10000))
@@ -1,3 +1,4 @@
+import threading
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 from config import Config
@@ -6,6 +7,8 @@ class Database:
     _instance = None
     _client = None
     _db = None
+    _fast_clients = {}
+    _fast_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -13,9 +16,17 @@ class Database:
         return cls._instance
     
     def connect(self):
-        """Connect to MongoDB"""
+        """Connect to MongoDB (a 'mongomock://' URI uses an in-memory stand-in)"""
         try:
-            self._client = MongoClient(Config.MONGODB_URI)
+            # Don't leak the previous client's pools when reconnecting
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            if Config.MONGODB_URI.startswith('mongomock://'):
+                import mongomock
+                self._client = mongomock.MongoClient()
+            else:
+                self._client = MongoClient(Config.MONGODB_URI)
             # Test connection
             self._client.admin.command('ping')
             self._db = self._client[Config.DATABASE_NAME]
@@ -31,6 +42,31 @@ class Database:
             self.connect()
         return self._db
     
+    def get_fast_db(self, timeout_ms):
+        """
+        Database on a long-lived client with short timeouts, for callers that
+        must not block for long (health probes, token checks). pymongo
+        reconnects it internally; nothing here builds a new client per call.
+        """
+        if Config.MONGODB_URI.startswith('mongomock://'):
+            # The in-memory stand-in is per client, so share the main one
+            return self.get_db()
+        with self._fast_lock:
+            client = self._fast_clients.get(timeout_ms)
+            if client is None:
+                client = MongoClient(Config.MONGODB_URI, serverSelectionTimeoutMS=timeout_ms,
+                                     connectTimeoutMS=timeout_ms, socketTimeoutMS=timeout_ms, connect=False)
+                self._fast_clients[timeout_ms] = client
+        return client[Config.DATABASE_NAME]
+    
+    def get_gridfs(self, collection='fs'):
+        """GridFS store on the configured database"""
+        import gridfs
+        if Config.MONGODB_URI.startswith('mongomock://'):
+            from mongomock.gridfs import enable_gridfs_integration
+            enable_gridfs_integration()
+        return gridfs.GridFS(self.get_db(), collection=collection)
+    
     def close(self):
         """Close MongoDB connection"""
         if self._client:
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings for production: gunicorn -c gunicorn.conf.py "app:create_app()"
+"""
+import os
+
+# Workers inherit this from the master; it lets the memory watchdog recycle them
+os.environ.setdefault('WORKER_SUPERVISED', '1')
+
+bind = f"0.0.0.0:{os.getenv('PORT', 4000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 180))
+# A recycling worker finishes in-flight requests within this window
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 60))
+
+
+def post_fork(server, worker):
+    # Readiness measures saturation against the worker's real thread count,
+    # including a --threads given on the command line
+    os.environ['GUNICORN_THREADS'] = str(worker.cfg.threads)
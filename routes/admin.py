@@ -0,0 +1,80 @@
+from flask import Blueprint, request, jsonify, send_file
+from utils.auth_utils import is_admin_request
+from utils.profiling import profile_store
+from utils.memory_watchdog import memory_watchdog
+from utils.audit_log import audit_log
+from utils.documents import documents
+from utils.token_revocation import token_revocations
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+@admin_bp.before_request
+def require_admin():
+    """All admin endpoints need a valid X-Admin-Token header"""
+    if not is_admin_request(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+@admin_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """List stored request profiles, newest first"""
+    summaries = profile_store.list()
+    return jsonify({
+        'profiles': [
+            {
+                'id': s['id'],
+                'created_at': s['created_at'],
+                'path': s['path'],
+                'status': s['status'],
+                'trigger': s['trigger'],
+                'duration_ms': s['duration_ms'],
+                'slowest_stages': s['stages'][:3],
+            }
+            for s in summaries
+        ]
+    }), 200
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Full summary of one profile: stage timings and top functions"""
+    summary = profile_store.get(profile_id)
+    if not summary:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(summary), 200
+
+@admin_bp.route('/profiles/<profile_id>/download', methods=['GET'])
+def download_profile(profile_id):
+    """Raw pstats file, loadable with pstats/snakeviz"""
+    stats_path = profile_store.stats_path(profile_id)
+    if not stats_path:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(stats_path, mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f"{profile_id}.prof")
+
+@admin_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Worker metrics for this process, including memory per endpoint"""
+    return jsonify({
+        'memory': memory_watchdog.metrics(),
+        'audit_log': audit_log.stats(),
+        'documents': documents.stats(),
+        'token_revocations': token_revocations.stats()
+    }), 200
+
+@admin_bp.route('/usage', methods=['GET'])
+def top_usage():
+    """Heaviest users by pages converted (?days=30&limit=20)"""
+    try:
+        days = int(request.args.get('days', 30))
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'days and limit must be integers'}), 400
+    return jsonify({'days': days, 'users': audit_log.top_users(days=days, limit=limit)}), 200
+
+@admin_bp.route('/usage/<user_id>', methods=['GET'])
+def user_usage(user_id):
+    """Conversion totals and recent conversions for one user (?days=30)"""
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    return jsonify(audit_log.usage(user_id, days=days)), 200
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from database import db
 from models.user import User
-from utils.auth_utils import hash_password, verify_password, generate_token, verify_token
+from utils.auth_utils import hash_password, verify_password, generate_token, verify_token, revoke_token
 from bson import ObjectId
 import re
 
@@ -156,6 +156,15 @@ def get_user():
 
 @auth_bp.route('/user/logout', methods=['POST'])
 def logout():
-    """User logout endpoint (client-side token removal)"""
-    return jsonify({'message': 'Logout successful'}), 200
+    """User logout endpoint (revokes the presented token server-side)"""
+    try:
+        auth_header = request.headers.get('Authorization', '')
+        parts = auth_header.split(' ')
+        if len(parts) == 2:
+            payload = verify_token(parts[1])
+            if payload:
+                revoke_token(payload)
+        return jsonify({'message': 'Logout successful'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
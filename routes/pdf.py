@@ -1,13 +1,26 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, g, request, jsonify, send_file, url_for
+from pymongo.errors import PyMongoError
 from utils.auth_utils import verify_token
 from werkzeug.utils import secure_filename
 import os
 import tempfile
-import tabula
+import time
 import pandas as pd
 from io import BytesIO
-import re
-import PyPDF2
+from config import Config
+from utils.statement_parser import TARGET_HEADERS, extract_statement, resolve_engine
+from utils.bank_profiles import get_profiles
+from utils.documents import documents
+from utils.chunked_uploads import uploads
+from utils.pdf_probe import probe_pdf
+from utils.profiling import stage
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.audit_log import audit_log
+from utils.health import health_monitor
+from utils.result_store import result_key, result_store
+from utils.postprocessing import format_amounts, parse_amounts, postprocess_rows, reconciliation_frames
+from utils.serialization import (COLUMNAR_FORMATS, OUTPUT_FORMATS, json_response, resolve_format,
+                                 serialize_rows, unique_rows)
 
 # Set JAVA_HOME if Java is installed but not in PATH
 if not os.environ.get('JAVA_HOME'):
@@ -29,71 +42,215 @@ if not os.environ.get('JAVA_HOME'):
 
 pdf_bp = Blueprint('pdf', __name__, url_prefix='/api/pdf')
 
-# --- Authentication Mock/Placeholder ---
+# -------------------------
+# Authentication
+# -------------------------
 def get_user_from_token():
-    """Extract and verify user from token (Assumes 'utils.auth_utils.verify_token' exists)"""
-    # NOTE: This is a placeholder for actual token verification
-    auth_header = request.headers.get('Authorization')
-    if auth_header and len(auth_header.split(' ')) > 1:
-        return {'user_id': '123'}
-    return None
+    """Verify the request's Bearer token; returns its payload, or None if missing, invalid or revoked"""
+    auth_header = request.headers.get('Authorization', '')
+    parts = auth_header.split(' ')
+    if len(parts) != 2 or parts[0].lower() != 'bearer':
+        return None
+    return verify_token(parts[1])
 
 # -------------------------
-# Helper functions and Regex Patterns
+# Request helpers
 # -------------------------
-MONTHS_PATTERN = r"(JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)"
-AMOUNT_PATTERN = r"(\d[\d, ]*\.\d{2})"
+def remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+@pdf_bp.teardown_request
+def remove_ephemeral_files(exc=None):
+    """Spooled PDFs of documents that were never stored only live for their request"""
+    for path in g.pop('ephemeral_paths', []):
+        remove_file(path)
+
+def store_document(pdf_path, filename, user_id, probe=None, sha256=None):
+    """
+    Register a spooled PDF as a document. While the document store is down
+    the request goes ahead on an ephemeral document (no id, nothing kept, the
+    file deleted when the request ends); any other failure deletes the file.
+    """
+    if health_monitor.known_down('mongo'):
+        error = 'MongoDB health check failing'
+    else:
+        try:
+            return documents.register(pdf_path, filename, user_id, probe=probe, sha256=sha256)
+        except PyMongoError as e:
+            error = e
+        except Exception:
+            remove_file(pdf_path)
+            raise
+    if not os.path.exists(pdf_path):
+        raise RuntimeError(f"Document store unavailable: {error}")
+    print(f"Warning: document store unavailable, processing {filename} without a document id: {error}")
+    g.setdefault('ephemeral_paths', []).append(pdf_path)
+    return documents.ephemeral(pdf_path, filename, user_id, probe=probe, sha256=sha256)
+
+def open_request_pdf(user_payload):
+    """
+    Resolve the PDF for a request: a `document_id` handle from an earlier
+    upload, or the multipart `file`, which is stored as a new document (the
+    response hands its id back in X-Document-Id for reuse, unless the
+    document store is down and the file is only used for this request).
+    Returns (pdf_path, document, error_response).
+    """
+    document_id = request.args.get('document_id') or request.form.get('document_id')
+    if document_id:
+        document = documents.get(document_id, user_id=user_payload['user_id'])
+        if document is None:
+            return None, None, (jsonify({'error': 'Unknown or expired document_id'}), 404)
+    else:
+        if 'file' not in request.files:
+            return None, None, (jsonify({'error': 'No file provided'}), 400)
+        file = request.files['file']
+        if not file.filename.lower().endswith('.pdf'):
+            return None, None, (jsonify({'error': 'Only PDF files are allowed'}), 400)
 
-date_only_re = re.compile(rf"^{MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}})$", re.IGNORECASE)
-amount_re = re.compile(AMOUNT_PATTERN)
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+            file.save(temp_pdf.name)
+        document = store_document(temp_pdf.name, secure_filename(file.filename), user_payload['user_id'])
 
-def normalize_desc(s: str) -> str:
-    """Normalize description string for dedup checks"""
-    return re.sub(r"\s+", " ", (s or "").strip()).upper()
+    pdf_path = documents.local_path(document)
+    if pdf_path is None:
+        return None, None, (jsonify({'error': 'Document data is no longer available; upload it again'}), 404)
+    return pdf_path, document, None
 
-def is_footer_or_header(desc_upper: str) -> bool:
+def get_requested_engine():
+    """Read the extraction engine from the query string or form (?engine=tabula|layout)"""
+    return resolve_engine(request.args.get('engine') or request.form.get('engine'))
+
+def get_requested_format(default, allowed=None):
+    """Read the output format from the query string or form (?format=...)"""
+    return resolve_format(request.args.get('format') or request.form.get('format'), default=default, allowed=allowed)
+
+CONVERT_FORMATS = ('xlsx',) + tuple(OUTPUT_FORMATS)
+# convert adds the reconciliation's per-row gap flag to every output format
+CONVERT_HEADERS = TARGET_HEADERS + ['SUSPECTED_GAP', 'GAP_AMOUNT']
+AMOUNT_HEADERS = TARGET_HEADERS[1:3] + ['GAP_AMOUNT']
+
+def output_rows(table, output_format):
     """
-    Identifies and aggressively filters out all known redundant values.
-    FIXED: Expanded list and new numeric-only filtering.
+    Table rows for serialize_rows. Amounts are typed (float/None) in columnar
+    formats and 2-decimal strings in text formats, the same on every endpoint.
     """
-    # *** AGGRESSIVE FILTER LIST ***
-    footer_phrases = [
-        # Headers/Footers/Summaries/Account Labels
-        "MONTHLY", "NEXT STATEMENT", "DEP CONTENT", "UNC BATCH", "CHQS ENCLOSED", 
-        "BALANCE FORWARD", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "BALANCE", "DESCRIPTION",
-        "ITEMS", "CREDITS", "DEBITS", "NO.", "AMOUNT", "AVER.", "MIN.",
-        "STATEMENT OF ACCOUNT", "ACCOUNTS ISSUED BY", "PLEASE ENSURE", "ACCOUNT CAD",
-        "BUSINESS CHEQUING", "UNLIMITED",
-        
-        # Account/Address/Contact Details
-        "TDCDA", "TD CANADA TRUST", "BRAMPTON SPRINGDALE", "LAGERFELD DR", "L7A 5L3", 
-        "L6R 2K7", "11261991 CANADA INC.", "ARSHAD MOHAMMAD", "TEL:", "TTY:", 
-        "BRANCH NO", "ACCOUNT NO", "7594-5300663", "1-866-222-3456", "1-800-361-1180", 
-        
-        # Numeric/Code strings appearing as noise
-        "0028209", "0169", "08209", "0184" 
-    ]
-    
-    # 1. Filter by keyword or phrase match
-    if any(p in desc_upper for p in footer_phrases):
-        return True
-    
-    # 2. Filter extremely short strings (less than 4 chars)
-    if len(desc_upper) < 4 and not amount_re.search(desc_upper):
-        return True
-        
-    # 3. Filter lines that contain only numbers, spaces, dots, commas, or dashes (e.g., account numbers, balances without description)
-    if re.fullmatch(r'^[\d\s\.,-]+$', desc_upper):
-        return True
-        
-    return False
+    table = table.copy()
+    for column in table.columns.intersection(AMOUNT_HEADERS):
+        if output_format in COLUMNAR_FORMATS:
+            table[column] = parse_amounts(table[column]).to_numpy()
+        else:
+            table[column] = format_amounts(table[column])
+    return table.astype(object).where(table.notna(), None).values.tolist()
+
+def run_extraction(pdf_path, document, pages, engine, deadline=None, allow_partial=False):
+    """Extract a statement, reusing results already cached for the document's content"""
+    key = f"{pages}:{engine}"
+    extraction = documents.get_result(document, key)
+    if extraction is None:
+        extraction = extract_statement(pdf_path, pages=pages, engine=engine, deadline=deadline, allow_partial=allow_partial)
+        if not extraction['partial']:
+            documents.store_result(document, key, extraction)
+    return extraction
+
+def conversion_summary(extraction):
+    """The parts of an extraction kept by the audit log and stored results"""
+    return {
+        'pages': extraction['pages_processed'],
+        'rows': len(extraction['rows']),
+        'engine': extraction['engine'],
+        'bank_layout': extraction['profile'],
+    }
+
+def record_conversion(user_payload, file_hash, summary, started, output_format, result_bytes, cached=False):
+    """Queue an audit record for a finished conversion (written behind, off the request path)"""
+    audit_log.record(dict(
+        summary,
+        user_id=user_payload['user_id'],
+        endpoint=request.endpoint,
+        file_sha256=file_hash,
+        format=output_format,
+        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        result_bytes=result_bytes,
+        cached=cached,
+    ))
+
+def with_cache_headers(response, key):
+    """Results are immutable under their content address, so clients may keep them"""
+    response.set_etag(key)
+    response.headers['Cache-Control'] = f"private, max-age={Config.RESULT_CACHE_MAX_AGE}, immutable"
+    return response
+
+def not_modified(key):
+    return with_cache_headers(Response(status=304), key)
+
+def stored_result_response(key, meta, base_filename):
+    """Stream a stored conversion artifact (Range and If-None-Match handled for GET)"""
+    response = send_file(
+        result_store.artifact_path(key),
+        mimetype=meta['mimetype'],
+        as_attachment=True,
+        download_name=f"{base_filename}.{meta['extension']}",
+        etag=key
+    )
+    summary = meta.get('summary', {})
+    if 'suspected_gaps' in summary:
+        reconciled = summary['reconciled']
+        response.headers['X-Reconciled'] = 'unknown' if reconciled is None else str(reconciled).lower()
+        response.headers['X-Suspected-Gaps'] = str(summary['suspected_gaps'])
+    return with_cache_headers(response, key)
+
+def document_response(user_payload, document, file_size, extract, engine):
+    """Upload response for a newly registered document, optionally running the full extraction"""
+    probe = document['probe']
+    file_info = {
+        'filename': document['filename'],
+        'size_kb': round(file_size / 1024, 2),
+        'num_pages': probe['num_pages'],
+        'has_text_layer': probe['has_text_layer'],
+        'estimated_transactions': probe['estimated_transactions'],
+        'bank_layout': probe['bank_layout'],
+        'probe_ms': probe['probe_ms'],
+        # Kept for existing clients: the probe's estimate unless ?extract=1 counts them
+        'tables_found': probe.get('estimated_tables') or 0,
+        'tables_found_exact': False,
+    }
+    if extract:
+        started = time.perf_counter()
+        deadline = Deadline(Config.UPLOAD_DEADLINE_SECONDS)
+        extraction = run_extraction(documents.local_path(document), document, 'all', engine, deadline=deadline)
+        file_info['tables_found'] = extraction['tables_found']
+        file_info['tables_found_exact'] = True
+        file_info['transactions_found'] = len(extraction['rows'])
+        record_conversion(user_payload, document['sha256'], conversion_summary(extraction), started, None, 0)
+
+    return jsonify({
+        'message': 'File uploaded and parsed successfully',
+        'document_id': document['id'],
+        'expires_in': Config.DOCUMENT_TTL_SECONDS if document['id'] else None,
+        'file_info': file_info
+    }), 200
+
+def wants_extract():
+    return (request.args.get('extract') or request.form.get('extract', '')).lower() in ('1', 'true', 'yes')
+
+def deadline_response(error):
+    """504 for a request that ran past its processing deadline"""
+    return jsonify({'error': str(error) or 'Processing deadline exceeded', 'timeout': True}), 504
 
 # -------------------------
 # upload endpoint
 # -------------------------
 @pdf_bp.route('/upload', methods=['POST'])
 def upload_pdf():
-    # ... (Standard upload logic, unchanged)
+    """
+    Upload a PDF and probe it cheaply (page count, text layer, estimated
+    transactions, bank layout). The returned `document_id` can be passed to
+    convert/get-table-data instead of re-uploading. Full extraction only runs
+    with ?extract=1, and its result is cached on the document.
+    """
     try:
         user_payload = get_user_from_token()
         if not user_payload:
@@ -103,6 +260,12 @@ def upload_pdf():
         file = request.files['file']
         if not file.filename.lower().endswith('.pdf'):
             return jsonify({'error': 'Only PDF files are allowed'}), 400
+        extract = wants_extract()
+        try:
+            engine = get_requested_engine()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         file.seek(0, os.SEEK_END)
         file_size = file.tell()
         file.seek(0)
@@ -110,291 +273,249 @@ def upload_pdf():
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
             file.save(temp_file.name)
             temp_file_path = temp_file.name
-        num_pages = 0
-        tables_found = 0
+
         try:
-            # Get page count using PyPDF2
-            with open(temp_file_path, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                num_pages = len(pdf_reader.pages)
-            
-            # Extract tables using tabula-py
-            tables = tabula.read_pdf(temp_file_path, pages='all', multiple_tables=True, silent=True)
-            if tables:
-                tables_found = len(tables)
-        except Exception:
-            pass
-        finally:
+            with stage('probe'):
+                probe = probe_pdf(temp_file_path)
+        except Exception as probe_error:
             try:
                 os.unlink(temp_file_path)
             except:
                 pass
-        return jsonify({
-            'message': 'File uploaded and parsed successfully',
-            'file_info': {
-                'filename': filename,
-                'size_kb': round(file_size / 1024, 2),
-                'num_pages': num_pages,
-                'tables_found': tables_found,
-            }
-        }), 200
+            return jsonify({'error': f'Could not read PDF: {probe_error}'}), 400
+
+        document = store_document(temp_file_path, filename, user_payload['user_id'], probe=probe)
+        return document_response(user_payload, document, file_size, extract, engine)
 
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # -------------------------
-# convert endpoint - Fixed
+# chunked upload endpoints
 # -------------------------
-@pdf_bp.route('/convert', methods=['POST'])
-def convert_to_excel():
-    """Convert PDF to Excel endpoint"""
+@pdf_bp.route('/uploads', methods=['POST'])
+def init_chunked_upload():
+    """
+    Start a resumable upload. JSON body: filename, size (bytes) and optionally
+    sha256 of the whole file and a smaller chunk_size. Chunks are then PUT to
+    /uploads/<upload_id>/chunks/<index> in any order and the upload finished
+    with POST /uploads/<upload_id>/complete.
+    """
     try:
         user_payload = get_user_from_token()
         if not user_payload:
             return jsonify({'error': 'Unauthorized'}), 401
+        data = request.get_json(silent=True) or {}
+        filename = secure_filename(data.get('filename', ''))
+        if not filename.lower().endswith('.pdf'):
+            return jsonify({'error': 'Only PDF files are allowed'}), 400
+        try:
+            upload = uploads.init(
+                user_payload['user_id'],
+                filename,
+                int(data.get('size') or 0),
+                sha256=data.get('sha256'),
+                chunk_size=int(data.get('chunk_size') or 0) or None
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(uploads.status(upload)), 201
 
-        if 'file' not in request.files: return jsonify({'error': 'No file provided'}), 400
-        file = request.files['file']
-        if not file.filename.lower().endswith('.pdf'): return jsonify({'error': 'Only PDF files are allowed'}), 400
-
-        filename = secure_filename(file.filename)
-        base_filename = os.path.splitext(filename)[0]
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-            file.save(temp_pdf.name)
-            temp_pdf_path = temp_pdf.name
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        excel_buffer = BytesIO()
+@pdf_bp.route('/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Received and missing chunks of an upload, for resuming it"""
+    user_payload = get_user_from_token()
+    if not user_payload:
+        return jsonify({'error': 'Unauthorized'}), 401
+    upload = uploads.get(upload_id, user_id=user_payload['user_id'])
+    if upload is None:
+        return jsonify({'error': 'Unknown or expired upload_id'}), 404
+    return jsonify(uploads.status(upload)), 200
+
+@pdf_bp.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """Write one chunk (raw request body); X-Chunk-SHA256 optionally guards its contents"""
+    try:
+        user_payload = get_user_from_token()
+        if not user_payload:
+            return jsonify({'error': 'Unauthorized'}), 401
+        upload = uploads.get(upload_id, user_id=user_payload['user_id'])
+        if upload is None:
+            return jsonify({'error': 'Unknown or expired upload_id'}), 404
         try:
-            target_headers = ["DESCRIPTION", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "DATE"]
+            uploads.write_chunk(upload, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        status = uploads.status(upload)
+        return jsonify({
+            'index': index,
+            'received_chunks': status['received_chunks'],
+            'total_chunks': status['total_chunks'],
+            'page_count_hint': status['page_count_hint'],
+        }), 200
 
-            def clean_cell(cell):
-                if cell is None: return ""
-                text = str(cell).strip()
-                return re.sub(r'\s+', ' ', text) if text else ""
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            all_rows = []
-            seen_keys = set()
+@pdf_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """Verify and register a finished upload; responds like /upload (incl. ?extract=1)"""
+    try:
+        user_payload = get_user_from_token()
+        if not user_payload:
+            return jsonify({'error': 'Unauthorized'}), 401
+        try:
+            engine = get_requested_engine()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        upload = uploads.get(upload_id, user_id=user_payload['user_id'])
+        if upload is None:
+            return jsonify({'error': 'Unknown or expired upload_id'}), 404
+        missing = uploads.missing(upload)
+        if missing:
+            return jsonify({'error': 'Upload is missing chunks', 'missing_chunks': missing}), 409
+        try:
+            pdf_path, sha256 = uploads.complete(upload)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-            # Extract tables using tabula-py from all pages
+        try:
+            with stage('probe'):
+                probe = probe_pdf(pdf_path)
+        except Exception as probe_error:
             try:
-                tables = tabula.read_pdf(temp_pdf_path, pages='all', multiple_tables=True, silent=True)
-                if tables is None:
-                    tables = []
-                print(f"Successfully extracted {len(tables)} tables using tabula-py")
-            except Exception as tabula_error:
-                # If tabula fails (e.g., Java not installed), continue with text extraction only
-                import traceback
-                print(f"Warning: tabula-py failed: {tabula_error}")
-                print(f"Traceback: {traceback.format_exc()}")
-                tables = []
-            
-            # Get page count for tracking
-            with open(temp_pdf_path, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                total_pages = len(pdf_reader.pages)
-            
-            # Extract text from all pages for fallback processing
-            page_texts = {}
-            with open(temp_pdf_path, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    page_texts[page_num] = page.extract_text() or ""
-
-            # Process tables extracted by tabula-py
-            for table_idx, df in enumerate(tables):
-                if df is None or df.empty:
-                    continue
-                
-                # Convert DataFrame to list of lists for processing
-                tbl = df.values.tolist()
-                # Add header row if DataFrame has column names
-                if not df.columns.empty:
-                    header_row = [str(col) for col in df.columns.tolist()]
-                    tbl = [header_row] + tbl
-                
-                if not tbl or len(tbl) == 0:
-                    continue
-                
-                start_idx = 0
-                if tbl and tbl[0] and "DESCRIPTION" in clean_cell(tbl[0][0]).upper():
-                    start_idx = 1
-
-                for data_row in tbl[start_idx:]:
-                    cleaned = [clean_cell(c) for c in data_row]
-                    normalized = cleaned[:5] if len(cleaned) >= 5 else cleaned + [""] * (5 - len(cleaned))
-                    desc = normalized[0].strip()
-                    desc_norm = normalize_desc(desc)
-                    
-                    if not any(cell.strip() for cell in normalized) or is_footer_or_header(desc_norm):
-                        continue
-
-                    debit_raw = normalized[1].strip()
-                    credit_date_raw = normalized[2].strip()
-                    date_raw = normalized[3].strip() if len(normalized) > 3 else ""
-                    
-                    debit = ""
-                    credit = ""
-                    date = 'N/A'
-
-                    # Extract date from combined amount+date strings (e.g., "3,565.00OCT01")
-                    date_match = None
-                    combined_string = credit_date_raw + date_raw
-                    
-                    # Try to find date pattern in the combined string
-                    date_match = re.search(rf"({MONTHS_PATTERN}[\s\.]?\s*\d{{1,2}})", combined_string, re.IGNORECASE)
-                    if date_match:
-                        date_str = date_match.group(1).strip()
-                        m_date_parts = date_only_re.match(date_str)
-                        if m_date_parts:
-                            month = m_date_parts.group(1).upper()
-                            day = m_date_parts.group(2).zfill(2)
-                            date = month + day
-                    
-                    # Extract amount from debit column
-                    if re.search(AMOUNT_PATTERN, debit_raw):
-                        # Remove any date that might be attached to the amount
-                        amount_match = re.search(AMOUNT_PATTERN, debit_raw)
-                        if amount_match:
-                            debit = amount_match.group(0).strip().replace(' ', '')
-                    
-                    # Extract amount from credit/date column (remove date if present)
-                    if re.search(AMOUNT_PATTERN, credit_date_raw):
-                        amount_match = re.search(AMOUNT_PATTERN, credit_date_raw)
-                        if amount_match:
-                            credit = amount_match.group(0).strip().replace(' ', '')
-                    
-                    # If no date found yet, check the date column separately
-                    if date == 'N/A' and date_raw:
-                        date_match = re.search(rf"({MONTHS_PATTERN}[\s\.]?\s*\d{{1,2}})", date_raw, re.IGNORECASE)
-                        if date_match:
-                            date_str = date_match.group(1).strip()
-                            m_date_parts = date_only_re.match(date_str)
-                            if m_date_parts:
-                                month = m_date_parts.group(1).upper()
-                                day = m_date_parts.group(2).zfill(2)
-                                date = month + day
-                        
-                    if not debit and not credit:
-                        continue
-
-                    key = (desc_norm, (debit or credit), date)
-                    if key not in seen_keys:
-                        seen_keys.add(key)
-                        # Estimate page number based on table index (rough approximation)
-                        page_num = min((table_idx // 2) + 1, total_pages) if total_pages > 0 else 1
-                        all_rows.append({'row_data': [desc, debit, credit, date], 'page_num': page_num})
-
-            # 2) Advanced fallback using page text lines (Robust for multi-line transactions)
-            for page_num, page_text in page_texts.items():
-                page_text_lines = [ln for ln in page_text.splitlines() if ln.strip()]
-                
-                last_desc = None
-                i = 0
-                while i < len(page_text_lines):
-                    line = page_text_lines[i].strip()
-                    
-                    if is_footer_or_header(normalize_desc(line)):
-                        i += 1
-                        continue
-
-                    # 2a) If line matches full row (desc + amount + date)
-                    m_full = re.search(rf"^(.*?){AMOUNT_PATTERN}.*?{MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}})$", line, re.IGNORECASE)
-                    if m_full:
-                        desc = m_full.group(1).strip()
-                        amount = m_full.group(2).replace(" ", "")
-                        month = m_full.group(3).upper()
-                        day = m_full.group(4).zfill(2)
-                        date = month + day
-                        desc_norm = normalize_desc(desc)
-
-                        if not is_footer_or_header(desc_norm):
-                            key = (desc_norm, amount, date)
-                            if key not in seen_keys:
-                                withdrawal_keywords = ["SEND", "ATM", "WITHDRA", "AP", "TFR-TO"]
-                                debit = amount if any(w in desc_norm for w in withdrawal_keywords) else ""
-                                credit = "" if debit else amount
-                                all_rows.append({'row_data': [desc, debit, credit, date], 'page_num': page_num})
-                                seen_keys.add(key)
-                        
-                        last_desc = None # Reset state after full match
-                        i += 1
-                        continue
-
-                    # 2b) If line contains AMOUNT and DATE, and we have a pending description (`last_desc`)
-                    m_amount_date = re.search(rf"({AMOUNT_PATTERN}).*?({MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}}))", line, re.IGNORECASE)
-                    if m_amount_date and last_desc:
-                        amount = m_amount_date.group(1).replace(" ", "")
-                        date_str = m_amount_date.group(2).strip()
-                        
-                        # Extract Month and Day from the date string for normalization
-                        m_date_parts = date_only_re.match(date_str)
-                        if m_date_parts:
-                            month = m_date_parts.group(1).upper()
-                            day = m_date_parts.group(2).zfill(2)
-                            date = month + day
-                        else:
-                            # Fallback if only amount is found on this line
-                            i += 1
-                            continue # Wait for a date line, if any
-                        
-                        desc_norm = normalize_desc(last_desc)
-
-                        if not is_footer_or_header(desc_norm):
-                            key = (desc_norm, amount, date)
-                            if key not in seen_keys:
-                                withdrawal_keywords = ["SEND", "ATM", "WITHDRA", "AP", "TFR-TO"]
-                                debit = amount if any(w in desc_norm for w in withdrawal_keywords) else ""
-                                credit = "" if debit else amount
-                                all_rows.append({'row_data': [last_desc, debit, credit, date], 'page_num': page_num})
-                                seen_keys.add(key)
-                        
-                        last_desc = None
-                        i += 1
-                        continue
-
-                    # 2c) If line is alpha-heavy and likely a description (no amount or date), set `last_desc`
-                    if re.search(r"[A-Za-z]", line) and not amount_re.search(line) and not date_only_re.match(line):
-                        if not is_footer_or_header(normalize_desc(line)):
-                            last_desc = line.strip()
-                        i += 1
-                        continue
-                    
-                    # Fallthrough: reset state if no pairing was made
-                    last_desc = None
-                    i += 1
+                os.unlink(pdf_path)
+            except:
+                pass
+            return jsonify({'error': f'Could not read PDF: {probe_error}'}), 400
 
-            # Check if we found any rows after processing all pages
-            if not all_rows:
-                raise Exception("No table found in PDF. Please ensure the PDF contains a table.")
+        document = store_document(pdf_path, upload['filename'], user_payload['user_id'],
+                                  probe=probe, sha256=sha256)
+        return document_response(user_payload, document, upload['size'], wants_extract(), engine)
 
-            row_data_only = [row['row_data'] for row in all_rows]
-            df = pd.DataFrame(row_data_only, columns=target_headers)
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Sheet1', index=False)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            excel_buffer.seek(0)
+@pdf_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """Abort an upload and delete what was received"""
+    user_payload = get_user_from_token()
+    if not user_payload:
+        return jsonify({'error': 'Unauthorized'}), 401
+    if uploads.get(upload_id, user_id=user_payload['user_id']) is None:
+        return jsonify({'error': 'Unknown or expired upload_id'}), 404
+    uploads.discard(upload_id)
+    return jsonify({'message': 'Upload aborted'}), 200
 
+# -------------------------
+# convert endpoint - Fixed
+# -------------------------
+@pdf_bp.route('/convert', methods=['POST'])
+def convert_to_excel():
+    """Convert PDF to Excel endpoint"""
+    try:
+        user_payload = get_user_from_token()
+        if not user_payload:
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        try:
+            engine = get_requested_engine()
+            output_format = get_requested_format('xlsx', allowed=CONVERT_FORMATS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        pdf_path, document, error_response = open_request_pdf(user_payload)
+        if error_response:
+            return error_response
+        base_filename = os.path.splitext(document['filename'])[0]
+
+        started = time.perf_counter()
+        deadline = Deadline(Config.CONVERT_DEADLINE_SECONDS)
+        try:
+            file_hash = document['sha256']
+            key = result_key(file_hash, engine, output_format)
+            # The client already holds this exact result
+            if key in request.if_none_match:
+                return not_modified(key)
+
+            meta = result_store.get(key)
+            cached = meta is not None
+            if not cached:
+                extraction = run_extraction(pdf_path, document, 'all', engine, deadline=deadline)
+                all_rows = extraction['rows']
+
+                # Check if we found any rows after processing all pages
+                if not all_rows:
+                    raise Exception("No table found in PDF. Please ensure the PDF contains a table.")
+
+                # Typed amounts, date order and balance reconciliation
+                with stage('postprocess'):
+                    transactions, reconciliation = postprocess_rows(
+                        all_rows,
+                        opening_balance=extraction['balances']['opening'],
+                        closing_balance=extraction['balances']['closing']
+                    )
+                    table = transactions[CONVERT_HEADERS]
+
+                with stage(f'write_{output_format}'):
+                    if output_format == 'xlsx':
+                        output_buffer = BytesIO()
+                        summary_sheet, gaps_sheet = reconciliation_frames(reconciliation)
+                        with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
+                            table.to_excel(writer, sheet_name='Sheet1', index=False)
+                            summary_sheet.to_excel(writer, sheet_name='Reconciliation', index=False)
+                            gaps_sheet.to_excel(writer, sheet_name='Reconciliation', index=False,
+                                                startrow=len(summary_sheet) + 2)
+                        body = output_buffer.getvalue()
+                        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                        extension = 'xlsx'
+                    else:
+                        body, mimetype, extension = serialize_rows(
+                            CONVERT_HEADERS, output_rows(table, output_format), output_format)
+
+                summary = dict(
+                    conversion_summary(extraction),
+                    reconciled=reconciliation['reconciled'],
+                    suspected_gaps=reconciliation['suspected_gaps']
+                )
+                try:
+                    meta = result_store.put(key, body, mimetype, extension, summary, source_sha256=file_hash)
+                except OSError as e:
+                    print(f"Warning: Could not store conversion result: {e}")
+                    record_conversion(user_payload, file_hash, summary, started, output_format, len(body))
+                    response = send_file(BytesIO(body), mimetype=mimetype, as_attachment=True,
+                                         download_name=f"{base_filename}.{extension}")
+                    return with_cache_headers(response, key)
+
+            record_conversion(user_payload, file_hash, meta['summary'], started, output_format,
+                              meta['size'], cached=cached)
+
+        except DeadlineExceeded:
+            raise
         except Exception as parse_error:
             import traceback
             error_msg = str(parse_error)
             print(f"Error in PDF conversion: {error_msg}")
             print(traceback.format_exc())
             raise parse_error
-        finally:
-            try:
-                os.unlink(temp_pdf_path)
-            except:
-                pass
 
-        excel_filename = f"{base_filename}.xlsx"
-        return send_file(
-            excel_buffer,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=excel_filename
-        )
+        response = stored_result_response(key, meta, base_filename)
+        if document['id']:
+            response.headers['X-Document-Id'] = document['id']
+            # Where the same result can be fetched again without re-posting
+            response.headers['Content-Location'] = url_for(
+                'pdf.download_result', document_id=document['id'], engine=engine, format=output_format)
+        return response
 
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except Exception as e:
         import traceback
         error_msg = str(e)
@@ -402,6 +523,35 @@ def convert_to_excel():
         print(traceback.format_exc())
         return jsonify({'error': error_msg}), 500
 
+@pdf_bp.route('/documents/<document_id>/download', methods=['GET'])
+def download_result(document_id):
+    """Download a previously converted document straight from the stored result"""
+    try:
+        user_payload = get_user_from_token()
+        if not user_payload:
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        try:
+            engine = get_requested_engine()
+            output_format = get_requested_format('xlsx', allowed=CONVERT_FORMATS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        document = documents.get(document_id, user_id=user_payload['user_id'])
+        if document is None:
+            return jsonify({'error': 'Unknown or expired document_id'}), 404
+
+        key = result_key(document['sha256'], engine, output_format)
+        if key in request.if_none_match:
+            return not_modified(key)
+        meta = result_store.get(key)
+        if meta is None:
+            return jsonify({'error': 'No stored result for this document; convert it first'}), 404
+        return stored_result_response(key, meta, os.path.splitext(document['filename'])[0])
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # -------------------------
 # get-table-data endpoint - Fixed
 # -------------------------
@@ -416,235 +566,89 @@ def get_table_data():
         if not user_payload:
             return jsonify({'error': 'Unauthorized'}), 401
         
-        if 'file' not in request.files: return jsonify({'error': 'No file provided'}), 400
-        file = request.files['file']
-        if not file.filename.lower().endswith('.pdf'): return jsonify({'error': 'Only PDF files are allowed'}), 400
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-            file.save(temp_pdf.name)
-            temp_pdf_path = temp_pdf.name
+        try:
+            engine = get_requested_engine()
+            output_format = get_requested_format('json')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # ?layout=rows returns data as compact arrays aligned with `headers`
+        compact = request.args.get('layout', 'records') == 'rows'
+        # ?partial=1 returns the rows found so far if the deadline expires
+        allow_partial = request.args.get('partial', '').lower() in ('1', 'true', 'yes')
+        started = time.perf_counter()
+        deadline = Deadline(Config.TABLE_DATA_DEADLINE_SECONDS)
+
+        pdf_path, document, error_response = open_request_pdf(user_payload)
+        if error_response:
+            return error_response
 
         try:
-            # Check if PDF has pages using PyPDF2
-            with open(temp_pdf_path, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                if len(pdf_reader.pages) == 0:
-                    raise Exception("PDF contains no pages.")
-                
-                # Extract text from first page
-                first_page = pdf_reader.pages[0]
-                page_text = first_page.extract_text() or ""
-                page_text_lines = [ln for ln in page_text.splitlines() if ln.strip()]
-
-            target_headers = ["DESCRIPTION", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "DATE"]
-            
-            def clean_cell(cell):
-                if cell is None: return ""
-                text = str(cell).strip()
-                return re.sub(r'\s+', ' ', text) if text else ""
-
-            all_rows = []
-            seen_keys = set()
-            page_num = 1
-            
-            # Extract tables from first page using tabula-py
-            try:
-                tables = tabula.read_pdf(temp_pdf_path, pages=1, multiple_tables=True, silent=True)
-                if tables is None:
-                    tables = []
-                print(f"Successfully extracted {len(tables)} tables using tabula-py for get-table-data")
-            except Exception as tabula_error:
-                # If tabula fails (e.g., Java not installed), continue with text extraction only
-                import traceback
-                print(f"Warning: tabula-py failed in get-table-data: {tabula_error}")
-                print(f"Traceback: {traceback.format_exc()}")
-                tables = []
-
-            # 1) tabula-py table processing (with better filtering)
-            if tables:
-                for tbl_df in tables:
-                    if tbl_df is None or tbl_df.empty:
-                        continue
-                    
-                    # Convert DataFrame to list of lists for processing
-                    tbl = tbl_df.values.tolist()
-                    # Add header row if DataFrame has column names
-                    if not tbl_df.columns.empty:
-                        header_row = [str(col) for col in tbl_df.columns.tolist()]
-                        tbl = [header_row] + tbl
-                    
-                    if not tbl or len(tbl) == 0:
-                        continue
-                    
-                    start_idx = 0
-                    if tbl and tbl[0] and "DESCRIPTION" in clean_cell(tbl[0][0]).upper():
-                        start_idx = 1
-                    
-                    for data_row in tbl[start_idx:]:
-                        cleaned = [clean_cell(c) for c in data_row]
-                        normalized = cleaned[:5] if len(cleaned) >= 5 else cleaned + [""] * (5 - len(cleaned))
-
-                        desc = normalized[0].strip()
-                        desc_norm = normalize_desc(desc)
-                        
-                        if not any(cell.strip() for cell in normalized) or is_footer_or_header(desc_norm):
-                            continue
-                        
-                        debit_raw = normalized[1].strip()
-                        credit_date_raw = normalized[2].strip()
-                        date_raw = normalized[3].strip() if len(normalized) > 3 else ""
-                        
-                        debit = ""
-                        credit = ""
-                        date = 'N/A'
-
-                        # Extract date from combined amount+date strings (e.g., "3,565.00OCT01")
-                        date_match = None
-                        combined_string = credit_date_raw + date_raw
-                        
-                        # Try to find date pattern in the combined string
-                        date_match = re.search(rf"({MONTHS_PATTERN}[\s\.]?\s*\d{{1,2}})", combined_string, re.IGNORECASE)
-                        if date_match:
-                            date_str = date_match.group(1).strip()
-                            m_date_parts = date_only_re.match(date_str)
-                            if m_date_parts:
-                                month = m_date_parts.group(1).upper()
-                                day = m_date_parts.group(2).zfill(2)
-                                date = month + day
-                        
-                        # Extract amount from debit column
-                        if re.search(AMOUNT_PATTERN, debit_raw):
-                            # Remove any date that might be attached to the amount
-                            amount_match = re.search(AMOUNT_PATTERN, debit_raw)
-                            if amount_match:
-                                debit = amount_match.group(0).strip().replace(' ', '')
-                        
-                        # Extract amount from credit/date column (remove date if present)
-                        if re.search(AMOUNT_PATTERN, credit_date_raw):
-                            amount_match = re.search(AMOUNT_PATTERN, credit_date_raw)
-                            if amount_match:
-                                credit = amount_match.group(0).strip().replace(' ', '')
-                        
-                        # If no date found yet, check the date column separately
-                        if date == 'N/A' and date_raw:
-                            date_match = re.search(rf"({MONTHS_PATTERN}[\s\.]?\s*\d{{1,2}})", date_raw, re.IGNORECASE)
-                            if date_match:
-                                date_str = date_match.group(1).strip()
-                                m_date_parts = date_only_re.match(date_str)
-                                if m_date_parts:
-                                    month = m_date_parts.group(1).upper()
-                                    day = m_date_parts.group(2).zfill(2)
-                                    date = month + day
-                            
-                        if not debit and not credit:
-                            continue
-
-                        key = (desc_norm, (debit or credit), date)
-                        if key not in seen_keys:
-                            seen_keys.add(key)
-                            all_rows.append({'row_data': [desc, debit, credit, date], 'page_num': page_num})
-
-
-            # 2) Advanced fallback using page text lines (FIXED multi-line transaction logic)
-            last_desc = None
-            i = 0
-            while i < len(page_text_lines):
-                line = page_text_lines[i].strip()
-                
-                if is_footer_or_header(normalize_desc(line)):
-                    i += 1
-                    continue
-                    
-                # 2a) If line matches full row (desc + amount + date)
-                m_full = re.search(rf"^(.*?){AMOUNT_PATTERN}.*?{MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}})$", line, re.IGNORECASE)
-                if m_full:
-                    desc = m_full.group(1).strip()
-                    amount = m_full.group(2).replace(" ", "")
-                    month = m_full.group(3).upper()
-                    day = m_full.group(4).zfill(2)
-                    date = month + day
-                    desc_norm = normalize_desc(desc)
-
-                    if not is_footer_or_header(desc_norm):
-                        key = (desc_norm, amount, date)
-                        if key not in seen_keys:
-                            withdrawal_keywords = ["SEND", "ATM", "WITHDRA", "AP", "TFR-TO"]
-                            debit = amount if any(w in desc_norm for w in withdrawal_keywords) else ""
-                            credit = "" if debit else amount
-                            all_rows.append({'row_data': [desc, debit, credit, date], 'page_num': page_num})
-                            seen_keys.add(key)
-                    
-                    last_desc = None
-                    i += 1
-                    continue
-
-                # 2b) If line contains AMOUNT and DATE, and we have a pending description (`last_desc`)
-                m_amount_date = re.search(rf"({AMOUNT_PATTERN}).*?({MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}}))", line, re.IGNORECASE)
-                if m_amount_date and last_desc:
-                    amount = m_amount_date.group(1).replace(" ", "")
-                    date_str = m_amount_date.group(2).strip()
-                    
-                    m_date_parts = date_only_re.match(date_str)
-                    if m_date_parts:
-                        month = m_date_parts.group(1).upper()
-                        day = m_date_parts.group(2).zfill(2)
-                        date = month + day
-                    else:
-                        i += 1
-                        continue
-                    
-                    desc_norm = normalize_desc(last_desc)
-
-                    if not is_footer_or_header(desc_norm):
-                        key = (desc_norm, amount, date)
-                        if key not in seen_keys:
-                            withdrawal_keywords = ["SEND", "ATM", "WITHDRA", "AP", "TFR-TO"]
-                            debit = amount if any(w in desc_norm for w in withdrawal_keywords) else ""
-                            credit = "" if debit else amount
-                            all_rows.append({'row_data': [last_desc, debit, credit, date], 'page_num': page_num})
-                            seen_keys.add(key)
-                    
-                    last_desc = None
-                    i += 1
-                    continue
-
-                # 2c) If line is alpha-heavy and likely a description (no amount or date), set `last_desc`
-                if re.search(r"[A-Za-z]", line) and not amount_re.search(line) and not date_only_re.match(line):
-                    if not is_footer_or_header(normalize_desc(line)):
-                        last_desc = line.strip()
-                    i += 1
-                    continue
-
-                # Fallthrough: reset state
-                last_desc = None
-                i += 1
-            
-            # --- End of Line Parsing ---
+            extraction = run_extraction(pdf_path, document, 1, engine,
+                                        deadline=deadline, allow_partial=allow_partial)
+            all_rows = extraction['rows']
 
             # Check if we found any rows after processing all pages
             if not all_rows:
+                if extraction['partial']:
+                    raise DeadlineExceeded(f"Processing deadline of {deadline.seconds}s exceeded")
                 raise Exception("No transaction data found in PDF on Page 1.")
 
-            final_table_data = [row['row_data'] for row in all_rows if row['page_num'] == 1]
-            
-            # Final check to remove any duplicate rows that might have been added by both tabula-py tables and line parsing
-            # This uses pandas to drop duplicates
-            df = pd.DataFrame(final_table_data, columns=target_headers)
-            df.drop_duplicates(subset=["DESCRIPTION", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "DATE"], keep='first', inplace=True)
-
-            return jsonify({
-                'message': 'Table data extracted successfully for Page 1',
-                'headers': target_headers,
-                'data': df.to_dict('records')
-            }), 200
+            # Remove any duplicate rows that might have been added by both tables and line parsing
+            final_table_data = unique_rows(row['row_data'] for row in all_rows if row['page_num'] == 1)
+            final_table_data = output_rows(pd.DataFrame(final_table_data, columns=TARGET_HEADERS), output_format)
+
+            with stage(f'write_{output_format}'):
+                if output_format != 'json':
+                    body, mimetype, _ = serialize_rows(TARGET_HEADERS, final_table_data, output_format)
+                    response = Response(body, status=200, mimetype=mimetype)
+                else:
+                    if not compact:
+                        final_table_data = [dict(zip(TARGET_HEADERS, row)) for row in final_table_data]
+                    response = json_response({
+                        'message': 'Table data extracted successfully for Page 1',
+                        'headers': TARGET_HEADERS,
+                        'engine': engine,
+                        'layout_profile': extraction['profile'],
+                        'partial': extraction['partial'],
+                        'data': final_table_data
+                    }, 200)
+
+            record_conversion(user_payload, document['sha256'], conversion_summary(extraction),
+                              started, output_format, response.calculate_content_length())
+            if document['id']:
+                response.headers['X-Document-Id'] = document['id']
+            return response
 
         except Exception as parse_error:
             raise parse_error
-        finally:
-            try:
-                os.unlink(temp_pdf_path)
-            except:
-                pass
 
+    except DeadlineExceeded as e:
+        return deadline_response(e)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+# -------------------------
+# bank layout profiles
+# -------------------------
+@pdf_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """List the registered bank layout profiles"""
+    return jsonify({'profiles': [p.to_dict() for p in get_profiles()]}), 200
+
+# -------------------------
+# usage endpoint
+# -------------------------
+@pdf_bp.route('/usage', methods=['GET'])
+def get_usage():
+    """Conversion totals and recent conversions for the current user (?days=30)"""
+    try:
+        user_payload = get_user_from_token()
+        if not user_payload:
+            return jsonify({'error': 'Unauthorized'}), 401
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return jsonify({'error': 'days must be an integer'}), 400
+        return jsonify(audit_log.usage(user_payload['user_id'], days=days)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,173 @@
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from config import Config
+from database import db
+
+
+class ConversionAuditLog:
+    """
+    Write-behind log of conversions for billing and capacity planning.
+    record() only appends to an in-memory buffer; a background thread writes
+    batches with insert_many once AUDIT_BATCH_SIZE entries are waiting or
+    every AUDIT_FLUSH_SECONDS. While Mongo is unreachable entries stay
+    buffered, up to AUDIT_BUFFER_LIMIT (oldest dropped first), and the
+    buffer is flushed once more at shutdown.
+    """
+
+    def __init__(self, database=None, collection_name='conversion_audit'):
+        self.database = database or db
+        self.collection_name = collection_name
+        self.batch_size = Config.AUDIT_BATCH_SIZE
+        self.flush_seconds = Config.AUDIT_FLUSH_SECONDS
+        self._buffer = deque(maxlen=Config.AUDIT_BUFFER_LIMIT)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._indexes_ready = False
+        self.dropped = 0
+        self.written = 0
+        self.last_error = None
+
+    def _collection(self):
+        collection = self.database.get_db()[self.collection_name]
+        if not self._indexes_ready:
+            collection.create_index([('user_id', ASCENDING), ('created_at', DESCENDING)])
+            collection.create_index([('created_at', DESCENDING)])
+            self._indexes_ready = True
+        return collection
+
+    def record(self, entry):
+        """Queue one conversion record; never blocks on the database"""
+        entry = dict(entry, created_at=entry.get('created_at') or datetime.utcnow())
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(entry)
+            pending = len(self._buffer)
+        self._ensure_started()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything buffered; on failure the batch goes back to the front of the buffer"""
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                return True
+            try:
+                self._collection().insert_many(batch, ordered=False)
+                self.written += len(batch)
+                self.last_error = None
+                continue
+            except BulkWriteError as e:
+                # insert_many stamped each entry with an _id, so a retried entry
+                # that already made it in fails as a duplicate key: drop those
+                failed = sorted({err['index'] for err in e.details.get('writeErrors', []) if err.get('code') != 11000})
+                self.written += e.details.get('nInserted', 0)
+                batch = [batch[index] for index in failed]
+                if not batch:
+                    continue
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = str(e)
+
+            with self._lock:
+                # Requeue ahead of newer entries, respecting the buffer limit
+                room = self._buffer.maxlen - len(self._buffer)
+                self.dropped += max(0, len(batch) - room)
+                self._buffer.extendleft(reversed(batch[:room]))
+            print(f"Warning: Could not write conversion audit log: {self.last_error}")
+            return False
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            if not self.flush():
+                # Back off while the database is unavailable
+                self._stop.wait(self.flush_seconds)
+
+    def close(self):
+        """Stop the writer thread and flush what is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'last_error': self.last_error,
+        }
+
+    def usage(self, user_id, days=30, recent=20):
+        """Totals and most recent conversions for one user over the last `days` days"""
+        collection = self._collection()
+        since = datetime.utcnow() - timedelta(days=days)
+        match = {'user_id': user_id, 'created_at': {'$gte': since}}
+        totals = list(collection.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': None,
+                'conversions': {'$sum': 1},
+                'pages': {'$sum': '$pages'},
+                'rows': {'$sum': '$rows'},
+                'result_bytes': {'$sum': '$result_bytes'},
+                'duration_ms': {'$sum': '$duration_ms'},
+            }},
+        ]))
+        summary = totals[0] if totals else {
+            'conversions': 0, 'pages': 0, 'rows': 0, 'result_bytes': 0, 'duration_ms': 0,
+        }
+        summary.pop('_id', None)
+
+        entries = collection.find(match, {'_id': 0}).sort('created_at', DESCENDING).limit(recent)
+        return {
+            'user_id': user_id,
+            'days': days,
+            'totals': summary,
+            'recent': [dict(entry, created_at=entry['created_at'].isoformat()) for entry in entries],
+        }
+
+    def top_users(self, days=30, limit=20):
+        """Heaviest users by pages converted over the last `days` days"""
+        since = datetime.utcnow() - timedelta(days=days)
+        return list(self._collection().aggregate([
+            {'$match': {'created_at': {'$gte': since}}},
+            {'$group': {
+                '_id': '$user_id',
+                'conversions': {'$sum': 1},
+                'pages': {'$sum': '$pages'},
+                'rows': {'$sum': '$rows'},
+                'duration_ms': {'$sum': '$duration_ms'},
+            }},
+            {'$sort': {'pages': -1}},
+            {'$limit': limit},
+            {'$project': {'_id': 0, 'user_id': '$_id', 'conversions': 1, 'pages': 1, 'rows': 1, 'duration_ms': 1}},
+        ]))
+
+
+# Create a singleton instance
+audit_log = ConversionAuditLog()
@@ -1,7 +1,10 @@
+import hmac
+import uuid
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
 from config import Config
+from utils.token_revocation import token_revocations
 
 def hash_password(password):
     """Hash a password using bcrypt"""
@@ -22,7 +25,8 @@ def generate_token(user_id, email):
         'user_id': str(user_id),
         'email': email,
         'exp': datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS),
-        'iat': datetime.utcnow()
+        'iat': datetime.utcnow(),
+        'jti': uuid.uuid4().hex
     }
     token = jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm=Config.JWT_ALGORITHM)
     return token
@@ -31,9 +35,25 @@ def verify_token(token):
     """Verify and decode JWT token"""
     try:
         payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
+        if token_revocations.is_revoked(payload.get('jti')):
+            return None
         return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def revoke_token(payload):
+    """Revoke a decoded token until it would have expired"""
+    if not payload.get('jti'):
+        return False
+    token_revocations.revoke(payload['jti'], datetime.utcfromtimestamp(payload['exp']), payload.get('user_id'))
+    return True
+
+
+def is_admin_request(request):
+    """Check the request's X-Admin-Token header against the configured admin token"""
+    if not Config.ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(supplied.encode('utf-8'), Config.ADMIN_TOKEN.encode('utf-8'))
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+from config import Config
+
+# Headers, footers and summary labels shared by most statement layouts
+COMMON_NOISE_PHRASES = [
+    "MONTHLY", "NEXT STATEMENT", "DEP CONTENT", "UNC BATCH", "CHQS ENCLOSED",
+    "BALANCE FORWARD", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "BALANCE", "DESCRIPTION",
+    "ITEMS", "CREDITS", "DEBITS", "NO.", "AMOUNT", "AVER.", "MIN.",
+    "STATEMENT OF ACCOUNT", "ACCOUNTS ISSUED BY", "PLEASE ENSURE", "ACCOUNT CAD",
+    "TEL:", "TTY:", "BRANCH NO", "ACCOUNT NO",
+]
+
+# Customer address and account lines, matched by shape rather than by value
+COMMON_NOISE_PATTERNS = [
+    r"\b[A-Z]\d[A-Z] ?\d[A-Z]\d\b",                          # postal code
+    r"\b\d{4,5}-\d{6,7}\b",                                  # branch-account number
+    r"\b1-[0-9]{3}-[0-9]{3}-[0-9]{4}\b",                        # toll-free phone
+    r"^\d+ [A-Z0-9' ]+ (?:DR|ST|RD|AVE|BLVD|CRES|CRT|CT|WAY|LN|PL|HWY)\.?$",  # street address
+    r"^\d{6,} [A-Z ]+ (?:INC|LTD|LIMITED|CORP)\.?$",             # numbered company
+]
+
+# Only the first part of page 1 is needed to recognise a layout
+FINGERPRINT_CHARS = 2000
+
+
+class BankProfile:
+    """
+    Layout description for one bank's statements.
+    `fingerprint` phrases must all appear on page 1 for the profile to match.
+    `noise_phrases` are literal and `noise_patterns` are regexes; both are
+    matched against upper-cased descriptions.
+    `columns` are the x positions (points from the left edge) of the column
+    separators and `area` is [top, left, bottom, right] in points, both in
+    tabula's conventions. When `columns` is not configured, each statement's
+    own header anchors decide the columns; profiles are never changed by the
+    documents they parse.
+    """
+
+    def __init__(self, name, fingerprint, noise_phrases=None, columns=None, area=None, column_names=None,
+                 noise_patterns=None):
+        self.name = name
+        self.fingerprint = [p.upper() for p in fingerprint]
+        self.noise_phrases = COMMON_NOISE_PHRASES + [p.upper() for p in (noise_phrases or [])]
+        self.noise_patterns = COMMON_NOISE_PATTERNS + list(noise_patterns or [])
+        self.columns = list(columns) if columns else None
+        self.area = list(area) if area else None
+        self.column_names = column_names
+        # One alternation is much cheaper than a Python loop over every phrase
+        self.noise_re = re.compile("|".join([re.escape(p) for p in self.noise_phrases]
+                                            + [f"(?:{p})" for p in self.noise_patterns]))
+
+    def matches(self, text_upper):
+        """True if every fingerprint phrase appears in the page text"""
+        return bool(self.fingerprint) and all(p in text_upper for p in self.fingerprint)
+
+    def layout_boundaries(self):
+        """Fixed columns as layout-engine (column, left_edge) boundaries, or None"""
+        if not self.columns or not self.column_names:
+            return None
+        if len(self.column_names) != len(self.columns) + 1:
+            return None
+        return [(self.column_names[0], float('-inf'))] + list(zip(self.column_names[1:], self.columns))
+
+    def to_dict(self):
+        """Public summary of the profile"""
+        return {
+            'name': self.name,
+            'fingerprint': self.fingerprint,
+            'columns': self.columns,
+            'area': self.area,
+        }
+
+
+GENERIC_PROFILE = BankProfile('generic', fingerprint=[])
+
+_profiles = [
+    BankProfile(
+        'td_canada_trust',
+        fingerprint=["TD CANADA TRUST"],
+        noise_phrases=[
+            "BUSINESS CHEQUING", "UNLIMITED",
+            # Bank contact details
+            "TDCDA", "TD CANADA TRUST", "1-866-222-3456", "1-800-361-1180",
+        ],
+    ),
+]
+
+
+def register_profile(profile):
+    """Add a profile; later registrations win over earlier ones with the same name"""
+    global _profiles
+    _profiles = [p for p in _profiles if p.name != profile.name] + [profile]
+
+
+def get_profiles():
+    """All registered profiles, most recently registered first"""
+    return list(reversed(_profiles))
+
+
+def load_profiles_file(path):
+    """Register profiles from a JSON list of BankProfile keyword arguments"""
+    with open(path, 'r', encoding='utf-8') as profiles_file:
+        for entry in json.load(profiles_file):
+            register_profile(BankProfile(**entry))
+
+
+def detect_profile(first_page_text):
+    """Pick the bank profile for a statement from the start of its page 1 text"""
+    fingerprint_text = re.sub(r"\s+", " ", (first_page_text or "")[:FINGERPRINT_CHARS]).upper()
+    for profile in get_profiles():
+        if profile.matches(fingerprint_text):
+            return profile
+    return GENERIC_PROFILE
+
+
+if Config.BANK_PROFILES_FILE and os.path.exists(Config.BANK_PROFILES_FILE):
+    try:
+        load_profiles_file(Config.BANK_PROFILES_FILE)
+    except Exception as e:
+        print(f"Warning: Could not load bank profiles from {Config.BANK_PROFILES_FILE}: {e}")
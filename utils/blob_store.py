@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import time
+from config import Config
+from database import db
+
+
+def _replace_into(src_path, dest_path):
+    """Move a file into place without exposing a half-written destination"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.move(src_path, temp_path)
+        os.replace(temp_path, dest_path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class LocalBlobStore:
+    """PDF blobs in a directory (shared by the workers of a node), one file per content hash"""
+
+    def __init__(self, blob_dir):
+        self.blob_dir = blob_dir
+
+    def _path(self, sha256):
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}.pdf")
+
+    def exists(self, sha256):
+        return os.path.exists(self._path(sha256))
+
+    def put(self, sha256, src_path):
+        """Store the file at src_path under its hash; src_path is consumed"""
+        if self.exists(sha256):
+            os.unlink(src_path)
+        else:
+            _replace_into(src_path, self._path(sha256))
+
+    def local_path(self, sha256):
+        """Path of a blob on local disk, or None if it is not stored"""
+        path = self._path(sha256)
+        return path if os.path.exists(path) else None
+
+    def delete(self, sha256):
+        try:
+            os.unlink(self._path(sha256))
+        except OSError:
+            pass
+
+    def trim_cache(self, max_age_seconds):
+        """Nothing is cached: the blobs themselves are local"""
+
+
+class GridFSBlobStore:
+    """
+    PDF blobs in GridFS, keyed by content hash, so every node sees every
+    upload. Extraction needs a real file, so blobs are copied into a local
+    cache directory on first use.
+    """
+
+    def __init__(self, database=None, cache_dir=None, collection='pdf_blobs'):
+        self.database = database or db
+        self.cache_dir = cache_dir
+        self.collection = collection
+
+    def _fs(self):
+        return self.database.get_gridfs(self.collection)
+
+    def _cache_path(self, sha256):
+        return os.path.join(self.cache_dir, f"{sha256}.pdf")
+
+    def exists(self, sha256):
+        return self._fs().exists(sha256)
+
+    def put(self, sha256, src_path):
+        """Store the file at src_path under its hash; it becomes this node's cached copy"""
+        import gridfs
+        fs = self._fs()
+        if not fs.exists(sha256):
+            try:
+                with open(src_path, 'rb') as f:
+                    fs.put(f, _id=sha256, filename=f"{sha256}.pdf")
+            except gridfs.errors.FileExists:
+                # Another worker stored the same content first
+                pass
+        _replace_into(src_path, self._cache_path(sha256))
+
+    def local_path(self, sha256):
+        """Path of a locally cached copy, downloading it if needed; None if not stored"""
+        import gridfs
+        path = self._cache_path(sha256)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        try:
+            grid_out = self._fs().get(sha256)
+        except gridfs.errors.NoFile:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(grid_out, f)
+        os.replace(temp_path, path)
+        return path
+
+    def delete(self, sha256):
+        self._fs().delete(sha256)
+        try:
+            os.unlink(self._cache_path(sha256))
+        except OSError:
+            pass
+
+    def trim_cache(self, max_age_seconds):
+        """Drop cached copies not used for max_age_seconds"""
+        cutoff = time.time() - max_age_seconds
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def create_blob_store():
+    """Blob store selected by DOCUMENT_STORE ('local' or 'gridfs')"""
+    root = Config.DOCUMENT_SPOOL_DIR or os.path.join(tempfile.gettempdir(), 'pdf_documents')
+    if Config.DOCUMENT_STORE == 'gridfs':
+        return GridFSBlobStore(cache_dir=os.path.join(root, 'cache'))
+    if Config.DOCUMENT_STORE != 'local':
+        raise ValueError(f"Unknown DOCUMENT_STORE '{Config.DOCUMENT_STORE}'. Use 'local' or 'gridfs'")
+    return LocalBlobStore(root)
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from config import Config
+from database import db
+from utils.documents import file_sha256
+
+# Block size for streaming a chunk body to disk
+WRITE_BLOCK = 256 * 1024
+# Bytes kept from the previous block so a /Pages dictionary split across blocks is still seen
+SCAN_OVERLAP = 512
+# The page tree root's /Count is the document's page count
+pages_count_re = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b")
+
+
+class UploadSessions:
+    """
+    Resumable chunked uploads. init() preallocates a spool file; each chunk
+    is streamed straight to its offset in that file, checked against its
+    expected length and optional SHA-256, and can be re-sent until it lands.
+    While chunks are written their bytes are scanned for the page tree's
+    /Count, so a page count hint is usually known before the upload finishes.
+    complete() checks that every chunk arrived and the whole-file SHA-256.
+    Sessions and their received chunks live in Mongo (`upload_sessions`, with
+    a TTL index), so any worker sharing the spool directory can continue an
+    upload, including after a worker restart. Spool files left behind by
+    expired sessions are swept every DOCUMENT_CLEANUP_SECONDS.
+    """
+
+    def __init__(self, database=None, spool_dir=None, ttl_seconds=None):
+        self.database = database or db
+        self.spool_dir = spool_dir or os.path.join(
+            Config.DOCUMENT_SPOOL_DIR or tempfile.gettempdir(), 'pdf_uploads')
+        self.ttl_seconds = ttl_seconds or Config.UPLOAD_SESSION_TTL_SECONDS
+        self.sweep_seconds = Config.DOCUMENT_CLEANUP_SECONDS
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def _collection(self):
+        collection = self.database.get_db().upload_sessions
+        if not self._indexes_ready:
+            collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+            self._indexes_ready = True
+        return collection
+
+    def _path(self, upload_id):
+        return os.path.join(self.spool_dir, f"{upload_id}.part")
+
+    def init(self, user_id, filename, size, sha256=None, chunk_size=None):
+        """Start an upload session and return its record"""
+        chunk_size = min(chunk_size or Config.UPLOAD_CHUNK_SIZE, Config.UPLOAD_CHUNK_SIZE)
+        if size <= 0:
+            raise ValueError('size must be a positive number of bytes')
+        if size > Config.UPLOAD_MAX_BYTES:
+            raise ValueError(f'File is larger than the {Config.UPLOAD_MAX_BYTES} byte limit')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be a positive number of bytes')
+
+        self.sweep_if_due()
+        os.makedirs(self.spool_dir, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        with open(self._path(upload_id), 'wb') as f:
+            f.truncate(size)
+
+        now = datetime.utcnow()
+        upload = {
+            '_id': upload_id,
+            'user_id': user_id,
+            'filename': filename,
+            'size': size,
+            'sha256': sha256.lower() if sha256 else None,
+            'chunk_size': chunk_size,
+            'total_chunks': -(-size // chunk_size),
+            'received': [],
+            # 0 until a chunk reveals /Count; $max needs a number to compare against
+            'page_count_hint': 0,
+            'created_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl_seconds),
+        }
+        self._collection().insert_one(upload)
+        return self._to_record(upload)
+
+    def get(self, upload_id, user_id=None):
+        """Return a live upload session, or None if unknown, expired or owned by someone else"""
+        self.sweep_if_due()
+        query = {'_id': upload_id, 'expires_at': {'$gt': datetime.utcnow()}}
+        if user_id is not None:
+            query['user_id'] = user_id
+        upload = self._collection().find_one(query)
+        if upload is None or not os.path.exists(self._path(upload_id)):
+            return None
+        return self._to_record(upload)
+
+    def _to_record(self, upload):
+        record = dict(upload)
+        record['id'] = record.pop('_id')
+        record['path'] = self._path(record['id'])
+        return record
+
+    def write_chunk(self, upload, index, stream, chunk_sha256=None):
+        """Stream one chunk from `stream` to its place in the spool file; `upload` is refreshed"""
+        if not 0 <= index < upload['total_chunks']:
+            raise ValueError(f"Chunk index must be between 0 and {upload['total_chunks'] - 1}")
+        offset = index * upload['chunk_size']
+        expected_length = min(upload['chunk_size'], upload['size'] - offset)
+        sessions = self._collection()
+        sessions.update_one({'_id': upload['id']}, {'$pull': {'received': index}})
+
+        digest = hashlib.sha256()
+        written = 0
+        tail = b''
+        page_count = None
+        with open(upload['path'], 'r+b') as f:
+            f.seek(offset)
+            while True:
+                # Read at most one byte past the expected length to detect oversized chunks
+                block = stream.read(min(WRITE_BLOCK, expected_length - written + 1))
+                if not block:
+                    break
+                if index == 0 and written == 0 and not block.startswith(b'%PDF'):
+                    raise ValueError('File is not a PDF')
+                written += len(block)
+                if written > expected_length:
+                    raise ValueError(f"Chunk {index} is larger than {expected_length} bytes")
+                f.write(block)
+                digest.update(block)
+                page_count = max([page_count or 0] + self._scan_page_count(tail + block)) or None
+                tail = block[-SCAN_OVERLAP:]
+
+        if written != expected_length:
+            raise ValueError(f"Chunk {index} should be {expected_length} bytes, got {written}")
+        if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+            raise ValueError(f"Chunk {index} failed its SHA-256 check")
+        update = {
+            '$addToSet': {'received': index},
+            '$set': {'expires_at': datetime.utcnow() + timedelta(seconds=self.ttl_seconds)},
+        }
+        if page_count:
+            update['$max'] = {'page_count_hint': page_count}
+        stored = sessions.find_one_and_update({'_id': upload['id']}, update, return_document=ReturnDocument.AFTER)
+        if stored is not None:
+            upload.update(self._to_record(stored))
+
+    def _scan_page_count(self, data):
+        return [int(a or b) for a, b in pages_count_re.findall(data)]
+
+    def missing(self, upload):
+        """Indices of chunks not received yet"""
+        received = set(upload['received'])
+        return [i for i in range(upload['total_chunks']) if i not in received]
+
+    def complete(self, upload):
+        """
+        Check the whole file and end the session. Returns (path, sha256); the
+        caller takes ownership of the file. A checksum mismatch discards the upload.
+        """
+        if self.missing(upload):
+            raise ValueError('Upload is missing chunks')
+        # Claim the session so a concurrent complete() on another worker gets nothing
+        if self._collection().find_one_and_delete({'_id': upload['id']}) is None:
+            raise ValueError('Upload was already completed or has expired')
+        sha256 = file_sha256(upload['path'])
+        if upload['sha256'] and sha256 != upload['sha256']:
+            self._unlink(upload['path'])
+            raise ValueError('File failed its SHA-256 check; start a new upload')
+        return upload['path'], sha256
+
+    def status(self, upload):
+        missing = self.missing(upload)
+        return {
+            'upload_id': upload['id'],
+            'filename': upload['filename'],
+            'size': upload['size'],
+            'chunk_size': upload['chunk_size'],
+            'total_chunks': upload['total_chunks'],
+            'received_chunks': upload['total_chunks'] - len(missing),
+            'missing_chunks': missing,
+            'page_count_hint': upload['page_count_hint'] or None,
+            'expires_in': max(0, round((upload['expires_at'] - datetime.utcnow()).total_seconds())),
+        }
+
+    def discard(self, upload_id):
+        """Abort an upload and delete its spool file"""
+        self._collection().delete_one({'_id': upload_id})
+        self._unlink(self._path(upload_id))
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def sweep_if_due(self):
+        """Run sweep() if the last one was more than DOCUMENT_CLEANUP_SECONDS ago"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_seconds:
+                return
+            self._last_sweep = now
+        try:
+            self.sweep()
+        except Exception as e:
+            print(f"Warning: Upload spool sweep failed: {e}")
+
+    def sweep(self):
+        """Delete spool files of expired or unknown sessions untouched for a full TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            entries = [e for e in os.scandir(self.spool_dir) if e.name.endswith('.part')]
+        except OSError:
+            return 0
+        stale = {}
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    stale[entry.name[:-len('.part')]] = entry.path
+            except OSError:
+                pass
+        if not stale:
+            return 0
+        live = {u['_id'] for u in self._collection().find(
+            {'_id': {'$in': list(stale)}, 'expires_at': {'$gt': datetime.utcnow()}}, {'_id': 1})}
+        removed = 0
+        for upload_id, path in stale.items():
+            if upload_id not in live:
+                self._unlink(path)
+                removed += 1
+        return removed
+
+
+# Create a singleton instance
+uploads = UploadSessions()
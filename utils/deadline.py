@@ -0,0 +1,36 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its processing deadline"""
+
+    def __init__(self, message="Processing deadline exceeded", partial=None):
+        super().__init__(message)
+        # Whatever the interrupted stage had produced so far
+        self.partial = partial
+
+
+class Deadline:
+    """
+    A per-request time budget. Long loops call check() between units of work
+    (e.g. pages) so extraction stops cooperatively once the budget is spent.
+    A budget of 0/None never expires.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds or None
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """Seconds left, or None for no deadline"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, partial=None):
+        """Raise DeadlineExceeded if the budget is spent"""
+        if self.expired():
+            raise DeadlineExceeded(f"Processing deadline of {self.seconds}s exceeded", partial=partial)
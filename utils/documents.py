@@ -0,0 +1,223 @@
+import atexit
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING
+from config import Config
+from database import db
+from utils.blob_store import create_blob_store
+from utils.result_store import result_store
+
+# Extraction results kept in memory per worker (keyed by content hash)
+RESULT_CACHE_SIZE = 32
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """
+    Uploaded PDFs, referenced by `document_id` so later calls don't re-upload.
+    The bytes are stored once per content hash in a blob store (local
+    directory or GridFS); document records live in Mongo so any worker can
+    serve any handle, and expire DOCUMENT_TTL_SECONDS after their last use.
+    A background thread removes expired documents, trims users over their
+    quota (least recently used first) and deletes blobs nothing refers to,
+    along with any shared conversion results made from them.
+    """
+
+    def __init__(self, database=None, blob_store=None, ttl_seconds=None):
+        self.database = database or db
+        self.blob_store = blob_store or create_blob_store()
+        self.ttl_seconds = ttl_seconds or Config.DOCUMENT_TTL_SECONDS
+        self.cleanup_seconds = Config.DOCUMENT_CLEANUP_SECONDS
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._indexes_ready = False
+        self.last_cleanup = None
+        self.last_cleanup_result = None
+
+    def _collection(self, name='documents'):
+        database = self.database.get_db()
+        if not self._indexes_ready:
+            database.documents.create_index([('user_id', ASCENDING), ('last_used_at', DESCENDING)])
+            database.documents.create_index([('expires_at', ASCENDING)])
+            database.documents.create_index([('sha256', ASCENDING)])
+            database.document_blobs.create_index([('last_referenced_at', ASCENDING)])
+            self._indexes_ready = True
+        return database[name]
+
+    def register(self, pdf_path, filename, user_id, probe=None, sha256=None):
+        """Store a spooled PDF (consuming pdf_path) and return its document record"""
+        sha256 = sha256 or file_sha256(pdf_path)
+        size = os.path.getsize(pdf_path)
+        now = datetime.utcnow()
+        # Mark the blob as referenced before storing it so cleanup leaves it alone
+        self._collection('document_blobs').update_one(
+            {'_id': sha256},
+            {'$set': {'size': size, 'last_referenced_at': now}},
+            upsert=True
+        )
+        self.blob_store.put(sha256, pdf_path)
+
+        document = {
+            '_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'filename': filename,
+            'sha256': sha256,
+            'size': size,
+            'probe': probe,
+            'created_at': now,
+            'last_used_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl_seconds),
+        }
+        self._collection().insert_one(document)
+        self._ensure_started()
+        return self._to_record(document)
+
+    def ephemeral(self, pdf_path, filename, user_id, probe=None, sha256=None):
+        """
+        A document record for a PDF that could not be stored: it has no id,
+        nothing refers to it afterwards and pdf_path is left to the caller.
+        """
+        return {
+            'id': None,
+            'user_id': user_id,
+            'filename': filename,
+            'sha256': sha256 or file_sha256(pdf_path),
+            'size': os.path.getsize(pdf_path),
+            'probe': probe,
+            'path': pdf_path,
+        }
+
+    def get(self, document_id, user_id=None):
+        """Return a live document (extending its lifetime), or None if unknown, expired or owned by someone else"""
+        now = datetime.utcnow()
+        query = {'_id': document_id, 'expires_at': {'$gt': now}}
+        if user_id is not None:
+            query['user_id'] = user_id
+        document = self._collection().find_one_and_update(
+            query,
+            {'$set': {'last_used_at': now, 'expires_at': now + timedelta(seconds=self.ttl_seconds)}}
+        )
+        self._ensure_started()
+        return self._to_record(document) if document else None
+
+    def local_path(self, document):
+        """Path of the document's PDF on local disk, or None if its blob is gone"""
+        if document['id'] is None:
+            return document['path']
+        return self.blob_store.local_path(document['sha256'])
+
+    def _to_record(self, document):
+        record = dict(document)
+        record['id'] = record.pop('_id')
+        return record
+
+    def store_result(self, document, key, result):
+        """Cache an extraction result for the document's content"""
+        with self._lock:
+            self._results[(document['sha256'], key)] = result
+            self._results.move_to_end((document['sha256'], key))
+            while len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+
+    def get_result(self, document, key):
+        """Return a cached extraction result, or None"""
+        with self._lock:
+            result = self._results.get((document['sha256'], key))
+            if result is not None:
+                self._results.move_to_end((document['sha256'], key))
+            return result
+
+    def discard(self, document_id):
+        """Forget a document; its blob goes once no other document refers to it"""
+        self._collection().delete_one({'_id': document_id})
+
+    def cleanup(self):
+        """Remove expired documents, enforce per-user quotas and delete unreferenced blobs"""
+        now = datetime.utcnow()
+        documents = self._collection()
+        removed = {'expired': 0, 'over_quota': 0, 'blobs': 0, 'results': 0}
+
+        removed['expired'] = documents.delete_many({'expires_at': {'$lte': now}}).deleted_count
+
+        over_quota = documents.aggregate([
+            {'$group': {'_id': '$user_id', 'bytes': {'$sum': '$size'}, 'count': {'$sum': 1}}},
+            {'$match': {'$or': [
+                {'bytes': {'$gt': Config.DOCUMENT_USER_QUOTA_BYTES}},
+                {'count': {'$gt': Config.DOCUMENT_MAX_COUNT}},
+            ]}},
+        ])
+        for user in list(over_quota):
+            kept_bytes = kept_count = 0
+            evict = []
+            for document in documents.find({'user_id': user['_id']}, {'size': 1}).sort('last_used_at', DESCENDING):
+                kept_bytes += document['size']
+                kept_count += 1
+                if kept_bytes > Config.DOCUMENT_USER_QUOTA_BYTES or kept_count > Config.DOCUMENT_MAX_COUNT:
+                    evict.append(document['_id'])
+            if evict:
+                removed['over_quota'] += documents.delete_many({'_id': {'$in': evict}}).deleted_count
+
+        # Blobs untouched for a full cleanup interval with no document left pointing at them
+        blobs = self._collection('document_blobs')
+        stale_before = now - timedelta(seconds=self.cleanup_seconds)
+        for blob in list(blobs.find({'last_referenced_at': {'$lt': stale_before}})):
+            if documents.find_one({'sha256': blob['_id']}, {'_id': 1}):
+                continue
+            # Only delete if nobody re-referenced it meanwhile
+            if blobs.delete_one({'_id': blob['_id'], 'last_referenced_at': blob['last_referenced_at']}).deleted_count:
+                self.blob_store.delete(blob['_id'])
+                removed['blobs'] += 1
+                removed['results'] += result_store.delete_for_source(blob['_id'])
+
+        self.blob_store.trim_cache(self.ttl_seconds)
+        self.last_cleanup = now
+        self.last_cleanup_result = removed
+        return removed
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='document-cleanup', daemon=True)
+                self._thread.start()
+                atexit.register(self._stop.set)
+
+    def _run(self):
+        while not self._stop.wait(self.cleanup_seconds):
+            try:
+                self.cleanup()
+            except Exception as e:
+                print(f"Warning: Document cleanup failed: {e}")
+
+    def stats(self):
+        totals = list(self._collection().aggregate([
+            {'$group': {'_id': None, 'documents': {'$sum': 1}, 'bytes': {'$sum': '$size'}}},
+        ]))
+        return {
+            'store': Config.DOCUMENT_STORE,
+            'documents': totals[0]['documents'] if totals else 0,
+            'bytes': totals[0]['bytes'] if totals else 0,
+            'blobs': self._collection('document_blobs').count_documents({}),
+            'cached_results': len(self._results),
+            'last_cleanup': self.last_cleanup.isoformat() if self.last_cleanup else None,
+            'last_cleanup_removed': self.last_cleanup_result,
+        }
+
+
+# Create a singleton instance
+documents = DocumentRegistry()
@@ -0,0 +1,153 @@
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime
+from config import Config
+from database import db
+from utils.audit_log import audit_log
+from utils.memory_watchdog import memory_watchdog
+
+
+def check_mongo():
+    """Round-trip a ping to MongoDB through a short-timeout client that never reconnects from here"""
+    started = time.perf_counter()
+    db.get_fast_db(Config.HEALTH_MONGO_TIMEOUT_MS).command('ping')
+    return {'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+def check_tabula():
+    """The tabula engine needs its jar and a working `java`"""
+    from tabula.backend import jar_path
+    if not os.path.exists(jar_path()):
+        raise RuntimeError('tabula jar not found')
+    started = time.perf_counter()
+    result = subprocess.run(['java', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            stdin=subprocess.DEVNULL, timeout=10)
+    if result.returncode != 0:
+        raise RuntimeError(f"java -version exited with {result.returncode}")
+    version = result.stderr.decode('utf-8', 'replace').splitlines()
+    return {
+        'java': version[0] if version else None,
+        'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+class HealthMonitor:
+    """
+    Dependency checks for the liveness/readiness endpoints, run by a
+    background thread so a probe never waits on MongoDB or the JVM: Mongo is
+    pinged every HEALTH_REFRESH_SECONDS and java every
+    HEALTH_JAVA_REFRESH_SECONDS. Worker saturation and queue depth are read
+    from in-memory counters on each probe, so a busy worker is taken out of
+    rotation immediately. A missing JVM only degrades the worker: extraction
+    falls back to text parsing, so it stays in rotation.
+    """
+
+    def __init__(self):
+        self.checks = {
+            'mongo': (check_mongo, Config.HEALTH_REFRESH_SECONDS),
+            'tabula': (check_tabula, Config.HEALTH_JAVA_REFRESH_SECONDS),
+        }
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, name):
+        """Run one check now and cache its result"""
+        check, _ = self.checks[name]
+        try:
+            result = dict(check(), ok=True)
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        result['checked_at'] = time.time()
+        with self._lock:
+            self._results[name] = result
+        return result
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            now = time.time()
+            for name, (_, interval) in self.checks.items():
+                last = self._results.get(name)
+                if last is None or now - last['checked_at'] >= interval:
+                    self.refresh(name)
+            if self._stop.wait(1):
+                return
+
+    def _cached(self, name):
+        """A cached check result; one older than three refresh intervals counts as failed"""
+        with self._lock:
+            result = self._results.get(name)
+        if result is None:
+            return {'ok': False, 'error': 'not checked yet'}
+        age = time.time() - result['checked_at']
+        result = dict(result, age_seconds=round(age, 1))
+        result.pop('checked_at')
+        if age > 3 * self.checks[name][1]:
+            result.update(ok=False, error='check is stale')
+        return result
+
+    def known_down(self, name):
+        """True while the latest check of a dependency failed (not merely unchecked or stale)"""
+        with self._lock:
+            result = self._results.get(name)
+        return (result is not None and not result['ok']
+                and time.time() - result['checked_at'] <= 3 * self.checks[name][1])
+
+    def database_status(self):
+        return 'connected' if self._cached('mongo')['ok'] else 'disconnected'
+
+    def readiness(self):
+        """(ready, report): whether this worker should receive traffic, and why"""
+        mongo = self._cached('mongo')
+        tabula = self._cached('tabula')
+        # The readiness request itself is in flight too
+        inflight = max(0, memory_watchdog.inflight - 1)
+        workers = {
+            'inflight': inflight,
+            'max_inflight': Config.WORKER_MAX_INFLIGHT,
+            'draining': memory_watchdog.draining,
+        }
+        queues = {
+            'audit_log': {'pending': audit_log.pending(), 'limit': Config.AUDIT_BUFFER_LIMIT},
+        }
+
+        reasons = []
+        degraded = []
+        if not mongo['ok']:
+            reasons.append('mongo unavailable')
+        # read_tables falls back to text extraction without a JVM, so keep serving
+        if not tabula['ok']:
+            degraded.append('tabula engine unavailable; using text extraction')
+        if Config.WORKER_MAX_INFLIGHT and inflight >= Config.WORKER_MAX_INFLIGHT:
+            reasons.append('worker saturated')
+        if workers['draining']:
+            reasons.append('worker draining for recycle')
+        if queues['audit_log']['pending'] >= 0.9 * Config.AUDIT_BUFFER_LIMIT:
+            reasons.append('audit log backlog')
+
+        ready = not reasons
+        return ready, {
+            'status': ('degraded' if degraded else 'ready') if ready else 'unavailable',
+            'reasons': reasons,
+            'degraded': degraded,
+            'checks': {'mongo': mongo, 'tabula': tabula},
+            'workers': workers,
+            'queues': queues,
+            'pid': os.getpid(),
+            'time': datetime.utcnow().isoformat(),
+        }
+
+
+# Create a singleton instance
+health_monitor = HealthMonitor()
@@ -0,0 +1,183 @@
+import re
+import PyPDF2
+import pandas as pd
+
+# Column anchors, in the order the rest of the pipeline expects them
+LAYOUT_COLUMNS = ["DESCRIPTION", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "DATE", "BALANCE"]
+
+# Header spellings that mark each anchor column
+ANCHOR_ALIASES = {
+    "DESCRIPTION": ("DESCRIPTION",),
+    "CHEQUE/DEBIT": ("CHEQUE/DEBIT", "CHEQUES/DEBITS", "DEBIT", "WITHDRAWALS"),
+    "DEPOSIT/CREDIT": ("DEPOSIT/CREDIT", "DEPOSITS/CREDITS", "CREDIT", "DEPOSITS"),
+    "DATE": ("DATE",),
+    "BALANCE": ("BALANCE",),
+}
+
+# Average glyph width as a fraction of the font size (Helvetica-ish)
+GLYPH_WIDTH_RATIO = 0.5
+
+numeric_re = re.compile(r"^[\d\s\.,\-$]+$")
+
+
+def _collect_fragments(page):
+    """Collect positioned text fragments from a page as (x, y, width, text)"""
+    fragments = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            return
+        # Text space -> user space: position is the translation of tm * cm
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        scale = abs(tm[0] * cm[0]) or 1.0
+        size = (font_size or 10) * scale
+        for piece in text.splitlines():
+            piece = piece.strip()
+            if piece:
+                fragments.append((x, y, len(piece) * size * GLYPH_WIDTH_RATIO, piece, size))
+
+    page.extract_text(visitor_text=visitor)
+    return fragments
+
+
+def _cluster_rows(fragments):
+    """Group fragments that share a baseline into rows, top of page first"""
+    rows = []
+    for frag in sorted(fragments, key=lambda f: (-f[1], f[0])):
+        tolerance = max(frag[4] * 0.4, 2.0)
+        if rows and abs(rows[-1]['y'] - frag[1]) <= tolerance:
+            rows[-1]['cells'].append(frag)
+        else:
+            rows.append({'y': frag[1], 'cells': [frag]})
+    for row in rows:
+        row['cells'].sort(key=lambda f: f[0])
+    return rows
+
+
+def _match_anchor(text):
+    """Return the anchor column a header fragment names, if any"""
+    upper = re.sub(r"\s+", "", text.upper())
+    for column, aliases in ANCHOR_ALIASES.items():
+        if upper in aliases:
+            return column
+    return None
+
+
+def _find_anchors(row):
+    """Return {column: (left, right)} if the row looks like the table header"""
+    anchors = {}
+    for x, _, width, text, _ in row['cells']:
+        column = _match_anchor(text)
+        if column and column not in anchors:
+            anchors[column] = (x, x + width)
+    has_amount = "CHEQUE/DEBIT" in anchors or "DEPOSIT/CREDIT" in anchors
+    if "DESCRIPTION" in anchors and has_amount:
+        return anchors
+    return None
+
+
+def boundaries_from_anchors(anchors):
+    """Turn header anchor extents into sorted (column, left_edge) boundaries"""
+    ordered = sorted(anchors.items(), key=lambda item: item[1][0])
+    boundaries = [(ordered[0][0], float('-inf'))]
+    for (_, (_, prev_right)), (column, (left, _)) in zip(ordered, ordered[1:]):
+        boundaries.append((column, (prev_right + left) / 2))
+    return boundaries
+
+
+def detect_boundaries(pdf_path, pages='all', max_pages=3):
+    """
+    Return the (column, left_edge) boundaries of the first table header
+    found in this document, scanning at most `max_pages` pages, or None.
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        page_numbers = range(1, len(pdf_reader.pages) + 1) if pages == 'all' else pages
+        if isinstance(page_numbers, int):
+            page_numbers = [page_numbers]
+        for page_num in list(page_numbers)[:max_pages]:
+            for row in _cluster_rows(_collect_fragments(pdf_reader.pages[page_num - 1])):
+                anchors = _find_anchors(row)
+                if anchors:
+                    return boundaries_from_anchors(anchors)
+    return None
+
+
+def _assign_column(boundaries, frag):
+    """Pick the column for a fragment: numbers are right-aligned, text left-aligned"""
+    x, _, width, text, _ = frag
+    edge = x + width if numeric_re.match(text) else x
+    column = boundaries[0][0]
+    for name, left in boundaries:
+        if edge >= left:
+            column = name
+    return column
+
+
+def _page_rows(rows, boundaries):
+    """Convert clustered rows below the header into column-aligned records"""
+    records = []
+    pending_desc = None
+    for row in rows:
+        cells = {column: [] for column in LAYOUT_COLUMNS}
+        for frag in row['cells']:
+            cells[_assign_column(boundaries, frag)].append(frag[3])
+        record = [" ".join(cells[column]).strip() for column in LAYOUT_COLUMNS]
+        desc, debit, credit, date, balance = record
+
+        # Description wrapped onto its own line above the amounts
+        if desc and not (debit or credit or date or balance):
+            pending_desc = f"{pending_desc} {desc}" if pending_desc else desc
+            continue
+        if not desc and pending_desc:
+            record[0] = pending_desc
+        pending_desc = None
+        records.append(record)
+    return records
+
+
+def extract_layout_tables(pdf_path, pages='all', boundaries=None, deadline=None):
+    """
+    Extract transaction tables from glyph positions, without a JVM.
+    Returns one DataFrame per page that has a recognizable table, with
+    LAYOUT_COLUMNS as columns, the 1-based page number in df.attrs['page']
+    and the column boundaries used in df.attrs['boundaries'].
+    `boundaries` are (column, left_edge) hints used until a page shows its
+    own header; a detected header always wins, so a hint from another
+    statement never overrides this document's layout.
+    `deadline` is checked between pages; DeadlineExceeded carries the
+    tables finished so far.
+    """
+    tables = []
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        page_numbers = range(1, len(pdf_reader.pages) + 1) if pages == 'all' else pages
+        if isinstance(page_numbers, int):
+            page_numbers = [page_numbers]
+
+        current = boundaries
+        for page_num in page_numbers:
+            if deadline is not None:
+                deadline.check(partial=tables)
+            rows = _cluster_rows(_collect_fragments(pdf_reader.pages[page_num - 1]))
+            # A header on this page resets the anchors; otherwise reuse the last page's
+            body = []
+            for row in rows:
+                anchors = _find_anchors(row)
+                if anchors:
+                    current = boundaries_from_anchors(anchors)
+                    body = []
+                    continue
+                body.append(row)
+            rows = body
+            if current is None or not rows:
+                continue
+
+            records = _page_rows(rows, current)
+            if records:
+                df = pd.DataFrame(records, columns=LAYOUT_COLUMNS)
+                df.attrs['page'] = page_num
+                df.attrs['boundaries'] = current
+                tables.append(df)
+    return tables
@@ -0,0 +1,165 @@
+import ctypes
+import ctypes.util
+import gc
+import os
+import resource
+import signal
+import threading
+import time
+from flask import g, request
+from config import Config
+
+MB = 1024 * 1024
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+# glibc can hand freed arenas back to the OS; other libcs just skip this step
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+    _malloc_trim = _libc.malloc_trim
+except (OSError, AttributeError):
+    _malloc_trim = None
+
+
+def current_rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        return peak if peak > 1 << 32 else peak * 1024
+
+
+def reclaim_memory():
+    """Collect garbage cycles and return freed heap pages to the OS"""
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+class MemoryWatchdog:
+    """
+    Per-worker memory accounting. Tracks RSS around every request by endpoint,
+    reclaims memory after requests that grew the heap a lot, and once the
+    worker passes WORKER_MAX_RSS_MB or WORKER_MAX_REQUESTS it drains: it sends
+    itself SIGTERM right away, which gunicorn turns into a graceful restart
+    that lets in-flight requests finish within graceful_timeout (a busy
+    threaded worker may never reach zero in flight on its own). Recycling
+    needs a supervising master (WORKER_SUPERVISED, set by gunicorn.conf.py);
+    a standalone server such as `python app.py` only logs the limit, since
+    SIGTERM would stop it for good.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.requests_served = 0
+        self.draining = False
+        self.drain_reason = None
+        self.recycling = False
+        self.limit_logged = False
+        self.started_at = time.time()
+        self.endpoints = {}
+
+    def request_started(self):
+        with self._lock:
+            self.inflight += 1
+
+    def request_finished(self, endpoint, rss_before):
+        rss_after = current_rss_bytes()
+        delta = rss_after - rss_before
+        if delta > Config.WORKER_RECLAIM_MB * MB > 0:
+            reclaim_memory()
+            rss_after = current_rss_bytes()
+
+        with self._lock:
+            self.inflight -= 1
+            self.requests_served += 1
+            stats = self.endpoints.setdefault(endpoint or 'unknown', {
+                'requests': 0, 'rss_delta_total': 0, 'rss_delta_max': 0, 'rss_peak': 0,
+            })
+            stats['requests'] += 1
+            stats['rss_delta_total'] += delta
+            stats['rss_delta_max'] = max(stats['rss_delta_max'], delta)
+            stats['rss_peak'] = max(stats['rss_peak'], rss_after)
+
+            if not self.draining:
+                reason = self._drain_reason(rss_after)
+                if reason and Config.WORKER_SUPERVISED:
+                    self.drain_reason = reason
+                    self.draining = True
+                    print(f"Worker {os.getpid()} draining: {reason}")
+                elif reason and not self.limit_logged:
+                    self.limit_logged = True
+                    print(f"Warning: worker {os.getpid()} over its limit ({reason}) but not "
+                          f"running under a supervising master; not recycling")
+            recycle = self.draining and not self.recycling
+            if recycle:
+                self.recycling = True
+
+        if recycle:
+            self._recycle()
+
+    def _drain_reason(self, rss):
+        if Config.WORKER_MAX_RSS_MB and rss > Config.WORKER_MAX_RSS_MB * MB:
+            return f"RSS {rss // MB} MB over {Config.WORKER_MAX_RSS_MB} MB"
+        if Config.WORKER_MAX_REQUESTS and self.requests_served >= Config.WORKER_MAX_REQUESTS:
+            return f"served {self.requests_served} requests"
+        return None
+
+    def _recycle(self):
+        """Ask the worker to exit gracefully once the current response is flushed"""
+        print(f"Recycling worker {os.getpid()} ({self.drain_reason})")
+        timer = threading.Timer(0.5, os.kill, args=(os.getpid(), signal.SIGTERM))
+        timer.daemon = True
+        timer.start()
+
+    def metrics(self):
+        """Worker memory metrics, with per-endpoint RSS growth"""
+        with self._lock:
+            endpoints = {
+                name: {
+                    'requests': stats['requests'],
+                    'avg_rss_delta_mb': round(stats['rss_delta_total'] / stats['requests'] / MB, 2),
+                    'max_rss_delta_mb': round(stats['rss_delta_max'] / MB, 2),
+                    'peak_rss_mb': round(stats['rss_peak'] / MB, 2),
+                }
+                for name, stats in self.endpoints.items()
+            }
+            return {
+                'pid': os.getpid(),
+                'rss_mb': round(current_rss_bytes() / MB, 2),
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'requests_served': self.requests_served,
+                'inflight': self.inflight,
+                'draining': self.draining,
+                'drain_reason': self.drain_reason,
+                'limits': {
+                    'max_rss_mb': Config.WORKER_MAX_RSS_MB,
+                    'max_requests': Config.WORKER_MAX_REQUESTS,
+                    'recycling_enabled': Config.WORKER_SUPERVISED,
+                },
+                'endpoints': endpoints,
+            }
+
+    def init_app(self, app):
+        """Hook request accounting into a Flask app"""
+
+        @app.before_request
+        def track_request_memory():
+            g.rss_before = current_rss_bytes()
+            self.request_started()
+
+        @app.teardown_request
+        def finish_request_memory(exc=None):
+            if 'rss_before' in g:
+                self.request_finished(request.endpoint, g.pop('rss_before'))
+
+
+# Create a singleton instance
+memory_watchdog = MemoryWatchdog()
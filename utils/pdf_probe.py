@@ -0,0 +1,76 @@
+import time
+import PyPDF2
+from config import Config
+from utils.bank_profiles import detect_profile
+from utils.statement_parser import amount_date_re
+
+
+def _sample_order(num_pages):
+    """Pages to sample for the transaction estimate: first, last, middle, then the rest"""
+    order = []
+    for page_num in [1, num_pages, (num_pages + 1) // 2] + list(range(2, num_pages)):
+        if 1 <= page_num <= num_pages and page_num not in order:
+            order.append(page_num)
+    return order
+
+
+def count_transaction_lines(page_text):
+    """Count lines that look like a transaction (an amount followed by a date)"""
+    return sum(1 for line in page_text.splitlines() if amount_date_re.search(line))
+
+
+def probe_pdf(pdf_path, budget_ms=None):
+    """
+    Cheap metadata probe: page count, text-layer presence, an estimated
+    transaction count and the detected bank layout. Only page text is read;
+    sampling stops once `budget_ms` is spent and the estimate is extrapolated
+    from the pages seen so far.
+    """
+    budget_ms = budget_ms if budget_ms is not None else Config.PROBE_BUDGET_MS
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        if pdf_reader.is_encrypted:
+            return {
+                'num_pages': None,
+                'encrypted': True,
+                'has_text_layer': False,
+                'estimated_transactions': None,
+                'estimated_tables': 0,
+                'bank_layout': None,
+                'probe_ms': round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        num_pages = len(pdf_reader.pages)
+        sampled = {}
+        first_page_text = ""
+        for page_num in _sample_order(num_pages):
+            page_text = pdf_reader.pages[page_num - 1].extract_text() or ""
+            if page_num == 1:
+                first_page_text = page_text
+            sampled[page_num] = count_transaction_lines(page_text)
+            if time.perf_counter() >= deadline:
+                break
+
+    has_text_layer = bool(first_page_text.strip()) or any(sampled.values())
+    if sampled and has_text_layer:
+        estimated = round(sum(sampled.values()) / len(sampled) * num_pages)
+        # Statements carry one transaction table per page that has transactions
+        estimated_tables = round(sum(1 for count in sampled.values() if count) / len(sampled) * num_pages)
+    else:
+        estimated = None
+        estimated_tables = 0
+
+    return {
+        'num_pages': num_pages,
+        'encrypted': False,
+        'has_text_layer': has_text_layer,
+        'estimated_transactions': estimated,
+        'estimated_tables': estimated_tables,
+        'estimate_exact': len(sampled) == num_pages,
+        'sampled_pages': len(sampled),
+        'bank_layout': detect_profile(first_page_text).name if has_text_layer else None,
+        'probe_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from utils.statement_parser import TARGET_HEADERS
+
+DESCRIPTION, DEBIT, CREDIT, DATE = TARGET_HEADERS
+MONTH_NUMBERS = {month: number for number, month in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], 1)}
+# Month falls larger than this (in discovery order) mean the statement crossed into a new year
+YEAR_ROLLOVER_MONTHS = 6
+# Balances are printed to the cent; allow for float noise
+BALANCE_TOLERANCE = 0.005
+# Gaps listed in the report (all are flagged in the rows)
+MAX_REPORTED_GAPS = 100
+
+
+def _per_unique(values, parse):
+    """
+    Apply a vectorized string parser to each distinct value once and spread
+    the results back. Statement columns repeat heavily (dates, blanks), which
+    keeps the slow object-dtype string passes short.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna('').astype(str))
+    parsed = parse(pd.Series(uniques, dtype=object).str.strip().str.upper())
+    return pd.Series(parsed.to_numpy()[codes]) if len(codes) else pd.Series([], dtype=float)
+
+
+def _parse_amount_strings(text):
+    parts = text.str.extract(r'^(\(|-)?\$?\s*(\d[\d,]*(?:\.\d+)?|\.\d+)\s*(-|OD|\))?$')
+    amounts = pd.to_numeric(parts[1].str.replace(',', '', regex=False), errors='coerce')
+    negative = parts[0].notna() | parts[2].notna()
+    return amounts.where(~negative, -amounts)
+
+
+def _month_day_strings(text):
+    parts = text.str.extract(r'^([A-Z]{3})\s?(\d{1,2})$')
+    return parts[0].map(MONTH_NUMBERS) * 100 + pd.to_numeric(parts[1], errors='coerce')
+
+
+def parse_amounts(values):
+    """
+    Parse amount strings into floats ('' or unparseable -> NaN). A leading
+    or trailing '-', an 'OD' suffix or parentheses mark a negative amount.
+    """
+    return _per_unique(values, _parse_amount_strings)
+
+
+def format_amounts(values):
+    """
+    Amounts as 2-decimal strings ('89' and 89.0 -> '89.00', blanks -> ''), the
+    representation text output formats share. Text that isn't an amount is kept.
+    """
+    raw = pd.Series(list(values), dtype=object).fillna('').astype(str)
+    parsed = parse_amounts(raw)
+    formatted = parsed.map(lambda amount: f"{amount:.2f}", na_action='ignore')
+    return formatted.where(parsed.notna(), raw.str.strip()).tolist()
+
+
+def date_ordinals(dates):
+    """
+    Turn MMMDD dates (in statement order) into sortable integers. The year
+    is unknown, so a drop of more than YEAR_ROLLOVER_MONTHS between rows
+    starts a new year. Rows without a date ('N/A') take the previous row's.
+    """
+    month_days = _per_unique(dates, _month_day_strings)
+    months = month_days // 100
+    days = month_days % 100
+
+    filled_months = months.ffill().bfill()
+    years = (filled_months.diff() < -YEAR_ROLLOVER_MONTHS).cumsum()
+    ordinals = years * 372 + (months - 1) * 31 + days
+    return ordinals.ffill().bfill().fillna(0).astype(np.int64)
+
+
+def postprocess_rows(rows, opening_balance=None, closing_balance=None):
+    """
+    Typed, ordered and reconciled transactions.
+
+    `rows` are extract_statement rows. Returns (DataFrame, report): the frame
+    has numeric CHEQUE/DEBIT, DEPOSIT/CREDIT and BALANCE columns, PAGE and
+    DATE_ORDINAL, sorted stably by date then page, plus SUSPECTED_GAP/GAP_AMOUNT
+    where a row's running balance doesn't follow from the previous one in
+    statement order (rows likely missed in between). The report reconciles the debit and credit
+    totals against the opening and closing balances; balances not given are
+    derived from the running balance column.
+    """
+    frame = pd.DataFrame([row['row_data'] for row in rows], columns=TARGET_HEADERS)
+    frame['PAGE'] = np.fromiter((row['page_num'] for row in rows), dtype=np.int64, count=len(rows))
+    frame['BALANCE'] = parse_amounts([row.get('balance', '') for row in rows])
+
+    # Statement order first (pages ascending, discovery order within a page) for the year rollover
+    frame = frame.iloc[np.argsort(frame['PAGE'].to_numpy(), kind='stable')].reset_index(drop=True)
+    raw_debits = frame[DEBIT]
+    raw_credits = frame[CREDIT]
+    frame[DEBIT] = parse_amounts(raw_debits)
+    frame[CREDIT] = parse_amounts(raw_credits)
+    frame['DATE_ORDINAL'] = date_ordinals(frame[DATE])
+    unparsed = int(((raw_debits.astype(str).str.strip() != '') & frame[DEBIT].isna()).sum()
+                   + ((raw_credits.astype(str).str.strip() != '') & frame[CREDIT].isna()).sum())
+
+    # Running balances follow the statement's own posting order, so gaps are
+    # checked before the date sort (a back-dated posting is not a gap)
+    debits = frame[DEBIT].fillna(0).to_numpy()
+    credits = frame[CREDIT].fillna(0).to_numpy()
+    balances = frame['BALANCE'].to_numpy()
+    running = np.cumsum(credits - debits)
+
+    # Each printed balance anchors the ones after it: expected = last printed balance + net since then
+    anchors = pd.Series(balances - running)
+    first_known = anchors.first_valid_index()
+    if opening_balance is None and first_known is not None:
+        opening_balance = float(anchors[first_known])
+    previous_anchor = anchors.shift(1)
+    if len(previous_anchor):
+        previous_anchor.iloc[0] = np.nan if opening_balance is None else opening_balance
+    expected = previous_anchor.ffill().to_numpy() + running
+    gaps = balances - expected
+    suspected = np.abs(gaps) > BALANCE_TOLERANCE
+    frame['SUSPECTED_GAP'] = suspected
+    frame['GAP_AMOUNT'] = np.where(suspected, np.round(gaps, 2), np.nan)
+
+    # np.lexsort is stable; the last key is the primary one. Gap flags move with their rows
+    order = np.lexsort((np.arange(len(frame)), frame['PAGE'].to_numpy(), frame['DATE_ORDINAL'].to_numpy()))
+    frame = frame.iloc[order].reset_index(drop=True)
+    suspected = frame['SUSPECTED_GAP'].to_numpy()
+
+    if closing_balance is None:
+        last_known = frame['BALANCE'].last_valid_index()
+        if last_known is not None:
+            closing_balance = float(frame['BALANCE'][last_known])
+
+    total_debits = float(debits.sum())
+    total_credits = float(credits.sum())
+    expected_closing = None if opening_balance is None else opening_balance + total_credits - total_debits
+    difference = None
+    if expected_closing is not None and closing_balance is not None:
+        difference = round(closing_balance - expected_closing, 2)
+
+    flagged = frame.loc[suspected, [DATE, 'PAGE', DESCRIPTION, 'GAP_AMOUNT']].head(MAX_REPORTED_GAPS)
+    report = {
+        'rows': len(frame),
+        'opening_balance': opening_balance,
+        'closing_balance': closing_balance,
+        'total_debits': round(total_debits, 2),
+        'total_credits': round(total_credits, 2),
+        'expected_closing_balance': None if expected_closing is None else round(expected_closing, 2),
+        'difference': difference,
+        'reconciled': None if difference is None else abs(difference) <= BALANCE_TOLERANCE,
+        'unparsed_amounts': unparsed,
+        'suspected_gaps': int(suspected.sum()),
+        'gaps': [
+            {'before_row': int(index), 'date': date, 'page': int(page), 'description': desc, 'missing_net': float(amount)}
+            for index, (date, page, desc, amount) in zip(flagged.index, flagged.itertuples(index=False))
+        ],
+    }
+    return frame, report
+
+
+def reconciliation_frames(report):
+    """The reconciliation report as a two-column summary and a table of suspected gaps"""
+    summary = pd.DataFrame(
+        [(key.replace('_', ' ').capitalize(), value) for key, value in report.items() if key != 'gaps'],
+        columns=['ITEM', 'VALUE']
+    )
+    gaps = pd.DataFrame(report['gaps'], columns=['before_row', 'date', 'page', 'description', 'missing_net'])
+    gaps.columns = [column.upper().replace('_', ' ') for column in gaps.columns]
+    return summary, gaps
@@ -0,0 +1,184 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from config import Config
+from utils.auth_utils import is_admin_request
+
+# Number of functions kept in a stored profile's summary
+TOP_FUNCTIONS = 15
+
+profile_id_re = re.compile(r"^[0-9a-f]{32}$")
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a named pipeline stage for the current request.
+    Timings accumulate per request and end up in profile summaries; outside a
+    request this is a no-op.
+    """
+    if not has_request_context():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - started)
+
+
+def get_stage_timings():
+    """Stage timings recorded so far in this request, slowest first, in ms"""
+    timings = g.get('stage_timings', {}) if has_request_context() else {}
+    return [
+        {'stage': name, 'ms': round(seconds * 1000, 2)}
+        for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+
+class ProfileStore:
+    """Stores request profiles on disk, capped by count and total size (oldest evicted first)"""
+
+    def __init__(self, directory=None, max_count=None, max_bytes=None):
+        self.directory = directory or Config.PROFILE_DIR or os.path.join(tempfile.gettempdir(), 'pdf_profiles')
+        self.max_count = max_count or Config.PROFILE_MAX_COUNT
+        self.max_bytes = max_bytes or Config.PROFILE_MAX_BYTES
+        self._lock = threading.Lock()
+
+    def _paths(self, profile_id):
+        return (os.path.join(self.directory, f"{profile_id}.json"),
+                os.path.join(self.directory, f"{profile_id}.prof"))
+
+    def save(self, profiler, summary):
+        """Write the raw stats and a JSON summary; returns the profile id"""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = uuid.uuid4().hex
+        summary_path, stats_path = self._paths(profile_id)
+        profiler.dump_stats(stats_path)
+        summary['id'] = profile_id
+        summary['size_bytes'] = os.path.getsize(stats_path)
+        with open(summary_path, 'w', encoding='utf-8') as summary_file:
+            json.dump(summary, summary_file)
+        with self._lock:
+            self._enforce_caps()
+        return profile_id
+
+    def list(self):
+        """Summaries of stored profiles, newest first"""
+        summaries = []
+        if not os.path.isdir(self.directory):
+            return summaries
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                summary = self.get(name[:-5])
+                if summary:
+                    summaries.append(summary)
+        return sorted(summaries, key=lambda s: s.get('created_at', 0), reverse=True)
+
+    def get(self, profile_id):
+        """A stored profile's summary, or None"""
+        if not profile_id_re.match(profile_id or ''):
+            return None
+        summary_path, _ = self._paths(profile_id)
+        try:
+            with open(summary_path, 'r', encoding='utf-8') as summary_file:
+                return json.load(summary_file)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id):
+        """Path of a stored profile's pstats file, or None"""
+        if not profile_id_re.match(profile_id or ''):
+            return None
+        _, stats_path = self._paths(profile_id)
+        return stats_path if os.path.exists(stats_path) else None
+
+    def delete(self, profile_id):
+        for path in self._paths(profile_id):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _enforce_caps(self):
+        summaries = sorted(self.list(), key=lambda s: s.get('created_at', 0))
+        total_bytes = sum(s.get('size_bytes', 0) for s in summaries)
+        while summaries and (len(summaries) > self.max_count or total_bytes > self.max_bytes):
+            oldest = summaries.pop(0)
+            total_bytes -= oldest.get('size_bytes', 0)
+            self.delete(oldest['id'])
+
+
+profile_store = ProfileStore()
+
+
+def _profile_trigger():
+    """Why this request should be profiled, or None"""
+    requested = request.headers.get('X-Profile') or request.args.get('profile')
+    if requested and requested.lower() in ('1', 'true', 'yes') and is_admin_request(request):
+        return 'requested'
+    if Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def _top_functions(profiler):
+    """Top functions by cumulative time"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({func})",
+            'calls': ncalls,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2),
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+def init_profiling(app):
+    """Profile admin-requested (X-Profile: 1 + X-Admin-Token) and randomly sampled requests"""
+
+    @app.before_request
+    def start_profiler():
+        trigger = _profile_trigger()
+        if trigger:
+            g.profile_trigger = trigger
+            g.profile_started = time.perf_counter()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def stop_profiler(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        try:
+            summary = {
+                'created_at': time.time(),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'trigger': g.get('profile_trigger'),
+                'duration_ms': round((time.perf_counter() - g.profile_started) * 1000, 2),
+                'stages': get_stage_timings(),
+                'top_functions': _top_functions(profiler),
+            }
+            response.headers['X-Profile-Id'] = profile_store.save(profiler, summary)
+        except Exception as e:
+            print(f"Warning: Could not store request profile: {e}")
+        return response
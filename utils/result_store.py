@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from config import Config
+from database import db
+from utils.statement_parser import PARSER_VERSION
+
+
+def result_key(pdf_sha256, engine, output_format):
+    """Content address of a conversion: input PDF hash + parser version + output options"""
+    address = f"{pdf_sha256}:{PARSER_VERSION}:{engine}:{output_format}"
+    return hashlib.sha256(address.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """
+    Converted files on disk, addressed by result_key(). Each artifact has a
+    JSON sidecar with its mimetype, extension and a conversion summary. The
+    directory can be shared by all workers on a node: files are written to a
+    temp name and renamed into place. Past RESULT_STORE_MAX_BYTES the least
+    recently served artifacts are removed.
+    With DOCUMENT_STORE=gridfs artifacts are also written to GridFS next to
+    the PDF blobs, so a result converted on one node can be downloaded from
+    any other; the local directory then acts as that node's cache.
+    """
+
+    def __init__(self, store_dir=None, max_bytes=None, database=None, shared_collection=None):
+        self.store_dir = store_dir or Config.RESULT_STORE_DIR or os.path.join(tempfile.gettempdir(), 'pdf_results')
+        self.max_bytes = max_bytes or Config.RESULT_STORE_MAX_BYTES
+        self.database = database or db
+        if shared_collection is None and Config.DOCUMENT_STORE == 'gridfs':
+            shared_collection = 'pdf_results'
+        self.shared_collection = shared_collection
+        self._lock = threading.Lock()
+
+    def _fs(self):
+        return self.database.get_gridfs(self.shared_collection)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.store_dir, f"{key}.{suffix}")
+
+    def artifact_path(self, key):
+        return self._path(key, 'bin')
+
+    def get(self, key):
+        """Return an artifact's metadata, or None if it is not stored"""
+        try:
+            with open(self._path(key, 'json'), 'r') as f:
+                meta = json.load(f)
+            # mtime doubles as last-served time for eviction
+            os.utime(self.artifact_path(key))
+        except (OSError, ValueError):
+            return self._fetch_shared(key)
+        return meta
+
+    def put(self, key, body, mimetype, extension, summary=None, source_sha256=None):
+        """Store an artifact and return its metadata"""
+        meta = {
+            'key': key,
+            'mimetype': mimetype,
+            'extension': extension,
+            'size': len(body),
+            'created_at': time.time(),
+            'summary': summary or {},
+            'source_sha256': source_sha256,
+        }
+        if self.shared_collection:
+            import gridfs
+            try:
+                self._fs().put(body, _id=key, filename=f"{key}.{extension}", metadata=meta)
+            except gridfs.errors.FileExists:
+                # Another node stored the same result first
+                pass
+            except Exception as e:
+                print(f"Warning: Could not share conversion result {key}: {e}")
+        self._store_local(key, body, meta)
+        return meta
+
+    def _store_local(self, key, body, meta):
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._write(self.artifact_path(key), body)
+        self._write(self._path(key, 'json'), json.dumps(meta).encode('utf-8'))
+        self._evict()
+
+    def _fetch_shared(self, key):
+        """Copy an artifact converted on another node into the local cache"""
+        if not self.shared_collection:
+            return None
+        import gridfs
+        try:
+            grid_out = self._fs().get(key)
+            body = grid_out.read()
+            meta = grid_out.metadata
+        except gridfs.errors.NoFile:
+            return None
+        except Exception as e:
+            print(f"Warning: Could not fetch shared conversion result {key}: {e}")
+            return None
+        self._store_local(key, body, meta)
+        return meta
+
+    def delete_for_source(self, source_sha256):
+        """Drop the shared artifacts converted from one PDF (its blob is gone)"""
+        if not self.shared_collection:
+            return 0
+        fs = self._fs()
+        keys = [f._id for f in fs.find({'metadata.source_sha256': source_sha256})]
+        for key in keys:
+            fs.delete(key)
+        return len(keys)
+
+    def _write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _evict(self):
+        """Drop least recently served artifacts until the store fits max_bytes"""
+        with self._lock:
+            artifacts = []
+            with os.scandir(self.store_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.bin'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        artifacts.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+            total = sum(size for _, size, _ in artifacts)
+            for _, size, key in sorted(artifacts):
+                if total <= self.max_bytes:
+                    break
+                for suffix in ('json', 'bin'):
+                    try:
+                        os.unlink(self._path(key, suffix))
+                    except OSError:
+                        pass
+                total -= size
+
+
+# Create a singleton instance
+result_store = ResultStore()
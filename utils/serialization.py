@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+from flask import Response
+
+# orjson is several times faster than the stdlib encoder; fall back if it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow is only needed for the columnar formats
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+OUTPUT_FORMATS = {
+    # format: (mimetype, file extension)
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+
+def dumps(payload):
+    """Encode a payload as JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Flask response for a JSON payload, encoded with the fast serializer"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def resolve_format(fmt, default='json', allowed=None):
+    """Validate a requested output format name"""
+    fmt = (fmt or default).strip().lower()
+    allowed = allowed or tuple(OUTPUT_FORMATS)
+    if fmt not in allowed:
+        raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(allowed)}")
+    if fmt in COLUMNAR_FORMATS and pa is None:
+        raise ValueError(f"Format '{fmt}' requires pyarrow, which is not installed on this server")
+    return fmt
+
+
+def unique_rows(rows):
+    """Drop duplicate rows, keeping the first occurrence and the original order"""
+    return [list(row) for row in dict.fromkeys(tuple(row) for row in rows)]
+
+
+def _to_ndjson(headers, rows):
+    return b"".join(dumps(dict(zip(headers, row))) + b"\n" for row in rows)
+
+
+def _to_csv(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _to_arrow_table(headers, rows):
+    columns = list(zip(*rows)) if rows else [()] * len(headers)
+    # Column types are inferred: text stays string, parsed amounts become doubles
+    return pa.table({header: pa.array(list(column)) for header, column in zip(headers, columns)})
+
+
+def _to_parquet(headers, rows):
+    buffer = io.BytesIO()
+    pq.write_table(_to_arrow_table(headers, rows), buffer)
+    return buffer.getvalue()
+
+
+def _to_arrow(headers, rows):
+    buffer = io.BytesIO()
+    table = _to_arrow_table(headers, rows)
+    with pa.ipc.new_file(buffer, table.schema) as writer:
+        writer.write_table(table)
+    return buffer.getvalue()
+
+
+def serialize_rows(headers, rows, fmt):
+    """
+    Serialize table rows (lists aligned with `headers`) in the given format.
+    Returns (body_bytes, mimetype, file_extension).
+    """
+    mimetype, extension = OUTPUT_FORMATS[fmt]
+    if fmt == 'json':
+        body = dumps({'headers': headers, 'data': rows})
+    elif fmt == 'ndjson':
+        body = _to_ndjson(headers, rows)
+    elif fmt == 'csv':
+        body = _to_csv(headers, rows)
+    elif fmt == 'parquet':
+        body = _to_parquet(headers, rows)
+    else:
+        body = _to_arrow(headers, rows)
+    return body, mimetype, extension
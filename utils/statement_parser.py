@@ -0,0 +1,373 @@
+import re
+import traceback
+import tabula
+import PyPDF2
+from config import Config
+from utils.bank_profiles import GENERIC_PROFILE, detect_profile
+from utils.layout_extractor import LAYOUT_COLUMNS, detect_boundaries, extract_layout_tables
+from utils.profiling import stage
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.tabula_runner import read_pdf_killable
+
+# -------------------------
+# Helper functions and Regex Patterns
+# -------------------------
+MONTHS_PATTERN = r"(JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)"
+AMOUNT_PATTERN = r"(\d[\d, ]*\.\d{2})"
+
+TARGET_HEADERS = ["DESCRIPTION", "CHEQUE/DEBIT", "DEPOSIT/CREDIT", "DATE"]
+EXTRACTION_ENGINES = ('tabula', 'layout')
+# Part of every stored result's address: bump whenever extraction output changes
+PARSER_VERSION = '4'
+
+date_only_re = re.compile(rf"^{MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}})$", re.IGNORECASE)
+date_search_re = re.compile(rf"({MONTHS_PATTERN}[\s\.]?\s*\d{{1,2}})", re.IGNORECASE)
+amount_re = re.compile(AMOUNT_PATTERN)
+full_row_re = re.compile(rf"^(.*?){AMOUNT_PATTERN}.*?{MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}})$", re.IGNORECASE)
+amount_date_re = re.compile(rf"({AMOUNT_PATTERN}).*?({MONTHS_PATTERN}[\s\.]?\s*(\d{{1,2}}))", re.IGNORECASE)
+
+WITHDRAWAL_KEYWORDS = ["SEND", "ATM", "WITHDRA", "AP", "TFR-TO"]
+
+# Statement balance lines; the balance is the last amount on the line
+opening_balance_re = re.compile(r"BALANCE FORWARD|OPENING BALANCE|STARTING BALANCE|PREVIOUS BALANCE", re.IGNORECASE)
+closing_balance_re = re.compile(r"CLOSING BALANCE|ENDING BALANCE|NEW BALANCE", re.IGNORECASE)
+balance_amount_re = re.compile(r"(?<![\d.])(-?(?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2})(OD|-)?", re.IGNORECASE)
+
+
+def normalize_desc(s: str) -> str:
+    """Normalize description string for dedup checks"""
+    return re.sub(r"\s+", " ", (s or "").strip()).upper()
+
+
+def clean_cell(cell):
+    """Collapse whitespace in a table cell"""
+    if cell is None: return ""
+    text = str(cell).strip()
+    return re.sub(r'\s+', ' ', text) if text else ""
+
+
+def is_footer_or_header(desc_upper: str, profile=None) -> bool:
+    """
+    Identifies and aggressively filters out all known redundant values.
+    Phrase noise comes from the statement's bank profile (see utils.bank_profiles).
+    """
+    profile = profile or GENERIC_PROFILE
+
+    # 1. Filter by keyword or phrase match
+    if profile.noise_re.search(desc_upper):
+        return True
+
+    # 2. Filter extremely short strings (less than 4 chars)
+    if len(desc_upper) < 4 and not amount_re.search(desc_upper):
+        return True
+
+    # 3. Filter lines that contain only numbers, spaces, dots, commas, or dashes (e.g., account numbers, balances without description)
+    if re.fullmatch(r'^[\d\s\.,-]+$', desc_upper):
+        return True
+
+    return False
+
+
+def parse_date(text):
+    """Find a MMMDD date in text (e.g. "3,565.00OCT01" -> "OCT01"), or None"""
+    date_match = date_search_re.search(text or "")
+    if date_match:
+        m_date_parts = date_only_re.match(date_match.group(1).strip())
+        if m_date_parts:
+            return m_date_parts.group(1).upper() + m_date_parts.group(2).zfill(2)
+    return None
+
+
+def find_statement_balances(page_texts):
+    """
+    Opening and closing balances printed on the statement: the first opening
+    line (e.g. BALANCE FORWARD) and the last closing line, None when absent.
+    """
+    opening = closing = None
+    for page_num in sorted(page_texts):
+        for line in page_texts[page_num].splitlines():
+            if opening is None and opening_balance_re.search(line):
+                opening = _last_balance_amount(line)
+            elif closing_balance_re.search(line):
+                amount = _last_balance_amount(line)
+                if amount is not None:
+                    closing = amount
+    return {'opening': opening, 'closing': closing}
+
+
+def _last_balance_amount(line):
+    amounts = balance_amount_re.findall(line)
+    if not amounts:
+        return None
+    value, suffix = amounts[-1]
+    amount = float(value.replace(',', ''))
+    return -abs(amount) if suffix else amount
+
+
+def parse_amount(text):
+    """Return the first amount in text with spaces removed, or ''"""
+    amount_match = amount_re.search(text or "")
+    return amount_match.group(0).strip().replace(' ', '') if amount_match else ""
+
+
+# -------------------------
+# Engines
+# -------------------------
+def resolve_engine(engine=None):
+    """Validate a requested engine name, falling back to the configured default"""
+    engine = (engine or Config.PDF_EXTRACTION_ENGINE or 'tabula').strip().lower()
+    if engine not in EXTRACTION_ENGINES:
+        raise ValueError(f"Unknown extraction engine '{engine}'. Use one of: {', '.join(EXTRACTION_ENGINES)}")
+    return engine
+
+
+def document_columns(pdf_path, pages='all'):
+    """
+    Tabula column separators from this document's header, or None.
+    Only a header with every anchor in pipeline order is used, since tabula
+    returns columns positionally.
+    """
+    try:
+        boundaries = detect_boundaries(pdf_path, pages)
+    except Exception as e:
+        print(f"Warning: Could not detect column boundaries: {e}")
+        return None
+    if not boundaries or [name for name, _ in boundaries] != LAYOUT_COLUMNS:
+        return None
+    return [round(left, 1) for _, left in boundaries[1:]]
+
+
+def read_tables(pdf_path, pages='all', engine='tabula', profile=None, deadline=None):
+    """
+    Run the selected table engine; engine failures degrade to text-only extraction.
+    Known layouts skip tabula's table detection: it gets the profile's fixed
+    `area`/`columns`, or the columns under this document's own header. The
+    layout engine takes the profile's boundaries as a hint and re-checks
+    them against each page's header.
+    With a `deadline`, the layout engine stops between pages and tabula-java
+    is killed when time runs out; both raise DeadlineExceeded.
+    """
+    profile = profile or GENERIC_PROFILE
+    try:
+        if engine == 'layout':
+            tables = extract_layout_tables(pdf_path, pages=pages, boundaries=profile.layout_boundaries(),
+                                           deadline=deadline)
+        else:
+            options = {}
+            columns = profile.columns
+            if not columns and profile is not GENERIC_PROFILE:
+                columns = document_columns(pdf_path, pages)
+            if columns:
+                options = {'guess': False, 'columns': columns}
+                if profile.area:
+                    options['area'] = profile.area
+            if deadline is not None and deadline.seconds:
+                tables = read_pdf_killable(pdf_path, timeout=deadline.remaining(), pages=pages, **options)
+            else:
+                tables = tabula.read_pdf(pdf_path, pages=pages, multiple_tables=True, silent=True, **options)
+        if tables is None:
+            tables = []
+        print(f"Successfully extracted {len(tables)} tables using {engine} ({profile.name} layout)")
+    except DeadlineExceeded:
+        raise
+    except Exception as engine_error:
+        # If the engine fails (e.g., Java not installed), continue with text extraction only
+        print(f"Warning: {engine} extraction failed: {engine_error}")
+        print(f"Traceback: {traceback.format_exc()}")
+        tables = []
+    return tables
+
+
+# -------------------------
+# Row extraction
+# -------------------------
+def rows_from_tables(tables, total_pages, seen_keys, page_num=None, profile=None):
+    """Turn engine tables into transaction rows, skipping noise and duplicates"""
+    all_rows = []
+    for table_idx, df in enumerate(tables):
+        if df is None or df.empty:
+            continue
+
+        # Convert DataFrame to list of lists for processing
+        tbl = df.values.tolist()
+        # Add header row if DataFrame has column names
+        if not df.columns.empty:
+            header_row = [str(col) for col in df.columns.tolist()]
+            tbl = [header_row] + tbl
+
+        start_idx = 0
+        if tbl and tbl[0] and "DESCRIPTION" in clean_cell(tbl[0][0]).upper():
+            start_idx = 1
+
+        if page_num is not None:
+            table_page = page_num
+        elif 'page' in df.attrs:
+            table_page = df.attrs['page']
+        else:
+            # Estimate page number based on table index (rough approximation)
+            table_page = min((table_idx // 2) + 1, total_pages) if total_pages > 0 else 1
+
+        for data_row in tbl[start_idx:]:
+            cleaned = [clean_cell(c) for c in data_row]
+            normalized = cleaned[:5] if len(cleaned) >= 5 else cleaned + [""] * (5 - len(cleaned))
+            desc = normalized[0].strip()
+            desc_norm = normalize_desc(desc)
+
+            if not any(cell.strip() for cell in normalized) or is_footer_or_header(desc_norm, profile):
+                continue
+
+            debit_raw = normalized[1].strip()
+            credit_date_raw = normalized[2].strip()
+            date_raw = normalized[3].strip()
+
+            # Date may be glued to the credit amount, or sit in its own column
+            date = parse_date(credit_date_raw + date_raw) or parse_date(date_raw) or 'N/A'
+            debit = parse_amount(debit_raw)
+            credit = parse_amount(credit_date_raw)
+
+            if not debit and not credit:
+                continue
+
+            key = (desc_norm, (debit or credit), date)
+            if key not in seen_keys:
+                seen_keys.add(key)
+                all_rows.append({'row_data': [desc, debit, credit, date], 'page_num': table_page,
+                                 'balance': normalized[4].strip()})
+    return all_rows
+
+
+def _append_text_row(all_rows, seen_keys, desc, amount, date, page_num, profile):
+    """Add a text-line match, guessing debit vs credit from the description"""
+    desc_norm = normalize_desc(desc)
+    if is_footer_or_header(desc_norm, profile):
+        return
+    key = (desc_norm, amount, date)
+    if key not in seen_keys:
+        debit = amount if any(w in desc_norm for w in WITHDRAWAL_KEYWORDS) else ""
+        credit = "" if debit else amount
+        all_rows.append({'row_data': [desc, debit, credit, date], 'page_num': page_num, 'balance': ''})
+        seen_keys.add(key)
+
+
+def rows_from_page_text(page_text, page_num, seen_keys, profile=None):
+    """Advanced fallback using page text lines (Robust for multi-line transactions)"""
+    all_rows = []
+    page_text_lines = [ln for ln in page_text.splitlines() if ln.strip()]
+
+    last_desc = None
+    for raw_line in page_text_lines:
+        line = raw_line.strip()
+
+        if is_footer_or_header(normalize_desc(line), profile):
+            continue
+
+        # a) If line matches full row (desc + amount + date)
+        m_full = full_row_re.search(line)
+        if m_full:
+            date = m_full.group(3).upper() + m_full.group(4).zfill(2)
+            _append_text_row(all_rows, seen_keys, m_full.group(1).strip(),
+                             m_full.group(2).replace(" ", ""), date, page_num, profile)
+            last_desc = None # Reset state after full match
+            continue
+
+        # b) If line contains AMOUNT and DATE, and we have a pending description (`last_desc`)
+        m_amount_date = amount_date_re.search(line)
+        if m_amount_date and last_desc:
+            m_date_parts = date_only_re.match(m_amount_date.group(2).strip())
+            if not m_date_parts:
+                continue # Wait for a date line, if any
+            date = m_date_parts.group(1).upper() + m_date_parts.group(2).zfill(2)
+            _append_text_row(all_rows, seen_keys, last_desc,
+                             m_amount_date.group(1).replace(" ", ""), date, page_num, profile)
+            last_desc = None
+            continue
+
+        # c) If line is alpha-heavy and likely a description (no amount or date), set `last_desc`
+        if re.search(r"[A-Za-z]", line) and not amount_re.search(line) and not date_only_re.match(line):
+            if not is_footer_or_header(normalize_desc(line), profile):
+                last_desc = line
+            continue
+
+        # Fallthrough: reset state if no pairing was made
+        last_desc = None
+    return all_rows
+
+
+def extract_statement(pdf_path, pages='all', engine=None, deadline=None, allow_partial=False):
+    """
+    Extract transaction rows from a statement PDF.
+    `pages` is 'all' or a 1-based page number. Returns a dict with the rows
+    ({'row_data': [desc, debit, credit, date], 'page_num': n, 'balance': raw
+    running balance or ''} in discovery order), the engine used, the detected
+    bank profile, the page count, the number of pages actually read and the
+    opening/closing balances printed on the statement.
+    `deadline` (utils.deadline.Deadline) is checked between pages. When it
+    expires DeadlineExceeded is raised, unless `allow_partial` is set, in
+    which case the rows found so far are returned with 'partial': True.
+    """
+    engine = resolve_engine(engine)
+    deadline = deadline or Deadline()
+    partial = False
+
+    # Extract text from the requested pages for fallback processing
+    page_texts = {}
+    with stage('text_extraction'), open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        total_pages = len(pdf_reader.pages)
+        if total_pages == 0:
+            raise Exception("PDF contains no pages.")
+        first_page_text = pdf_reader.pages[0].extract_text() or ""
+        page_numbers = range(1, total_pages + 1) if pages == 'all' else [pages]
+        try:
+            for page_num in page_numbers:
+                deadline.check()
+                if page_num == 1:
+                    page_texts[page_num] = first_page_text
+                else:
+                    page_texts[page_num] = pdf_reader.pages[page_num - 1].extract_text() or ""
+        except DeadlineExceeded:
+            if not allow_partial:
+                raise
+            partial = True
+
+    with stage('profile_detection'):
+        profile = detect_profile(first_page_text)
+
+    seen_keys = set()
+    tables = []
+    if not partial:
+        with stage(f'{engine}_tables'):
+            try:
+                tables = read_tables(pdf_path, pages=pages, engine=engine, profile=profile, deadline=deadline)
+            except DeadlineExceeded as e:
+                if not allow_partial:
+                    raise
+                partial = True
+                tables = e.partial or []
+    with stage('table_rows'):
+        single_page = None if pages == 'all' else pages
+        all_rows = rows_from_tables(tables, total_pages, seen_keys, page_num=single_page, profile=profile)
+
+    # The layout engine already knows its columns; only fall back to keyword
+    # guessing on pages where it found no table header
+    with stage('text_fallback'):
+        covered_pages = {df.attrs.get('page') for df in tables} if engine == 'layout' else set()
+        for page_num, page_text in page_texts.items():
+            if page_num not in covered_pages:
+                all_rows.extend(rows_from_page_text(page_text, page_num, seen_keys, profile))
+
+    return {
+        'rows': all_rows,
+        'engine': engine,
+        'profile': profile.name,
+        'total_pages': total_pages,
+        'pages_processed': len(page_texts),
+        'tables_found': len(tables),
+        'balances': find_statement_balances(page_texts),
+        'partial': partial,
+    }
+
+
+def extract_statement_rows(pdf_path, pages='all', engine=None):
+    """Extract transaction rows only (see extract_statement)"""
+    return extract_statement(pdf_path, pages=pages, engine=engine)['rows']
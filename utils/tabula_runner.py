@@ -0,0 +1,48 @@
+import json
+import os
+import signal
+import subprocess
+from tabula.backend import jar_path
+from tabula.errors import JavaNotFoundError
+from tabula.io import _extract_from
+from tabula.util import TabulaOption
+from utils.deadline import DeadlineExceeded
+
+JAVA_OPTIONS = [
+    "-Djava.awt.headless=true",
+    "-Dfile.encoding=UTF8",
+    # Same as tabula-py's silent=True
+    "-Dorg.slf4j.simpleLogger.defaultLogLevel=off",
+    "-Dorg.apache.commons.logging.Log=org.apache.commons.logging.impl.NoOpLog",
+]
+
+
+def read_pdf_killable(pdf_path, timeout=None, pages='all', **options):
+    """
+    tabula.read_pdf equivalent that runs tabula-java as its own process group
+    and kills it if `timeout` seconds pass, raising DeadlineExceeded.
+    Output is parsed exactly like tabula.read_pdf (JSON, first row as header).
+    """
+    tabula_options = TabulaOption(pages=pages, format='JSON', silent=True, multiple_tables=True, **options)
+    args = ["java"] + JAVA_OPTIONS + ["-jar", jar_path()] + tabula_options.build_option_list() + [pdf_path]
+    try:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   stdin=subprocess.DEVNULL, start_new_session=True)
+    except FileNotFoundError:
+        raise JavaNotFoundError("`java` command is not found from this Python process.")
+
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # The JVM may have forked helpers; take the whole group down (POSIX)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, AttributeError):
+            process.kill()
+        process.communicate()
+        raise DeadlineExceeded(f"tabula-java killed after {timeout:.1f}s")
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+    raw_json = json.loads(stdout.decode('utf-8')) if stdout.strip() else []
+    return _extract_from(raw_json)
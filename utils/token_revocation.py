@@ -0,0 +1,146 @@
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo import ASCENDING
+from config import Config
+from database import db
+
+# Re-read revocations a little before the last sync to cover clock skew between nodes
+SYNC_OVERLAP = timedelta(seconds=60)
+# Retry interval while the initial load has not succeeded
+INITIAL_SYNC_RETRY_SECONDS = 5
+
+
+class TokenRevocationList:
+    """
+    Revoked JWT ids (`jti`). Revocations are stored in Mongo with a TTL index
+    on the token's own expiry, so they disappear once the token would have
+    expired anyway. Each worker keeps the live ones in an in-memory dict that
+    a background thread refreshes every TOKEN_REVOCATION_SYNC_SECONDS, so
+    is_revoked() is a dict lookup rather than a database round trip.
+    Revocations made on this worker apply immediately; other workers pick
+    them up on their next sync.
+    The set is loaded before the first check. Until a sync has succeeded
+    (e.g. Mongo was down at startup) checks query Mongo directly, through a
+    client that gives up after TOKEN_REVOCATION_TIMEOUT_MS, and a token that
+    cannot be checked counts as revoked. Within INITIAL_SYNC_RETRY_SECONDS of
+    a failed attempt tokens are rejected without another round trip.
+    """
+
+    def __init__(self, database=None, collection_name='revoked_tokens'):
+        self.database = database or db
+        self.collection_name = collection_name
+        self.sync_seconds = Config.TOKEN_REVOCATION_SYNC_SECONDS
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._indexes_ready = False
+        self.last_sync = None
+        self.last_error = None
+        self._last_failure = None
+
+    def _collection(self):
+        collection = self.database.get_fast_db(Config.TOKEN_REVOCATION_TIMEOUT_MS)[self.collection_name]
+        if not self._indexes_ready:
+            collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+            collection.create_index([('revoked_at', ASCENDING)])
+            self._indexes_ready = True
+        return collection
+
+    def revoke(self, jti, expires_at, user_id=None):
+        """Revoke a token id until `expires_at` (the token's exp, a UTC datetime)"""
+        with self._lock:
+            self._revoked[jti] = expires_at
+        self._collection().update_one(
+            {'_id': jti},
+            {'$set': {'expires_at': expires_at, 'revoked_at': datetime.utcnow(), 'user_id': user_id}},
+            upsert=True
+        )
+
+    def is_revoked(self, jti):
+        """Constant-time check against the local set; tokens without a jti are never revoked"""
+        if jti is None:
+            return False
+        self._ensure_started()
+        if jti in self._revoked:
+            return True
+        if self.last_sync is None:
+            return self._lookup(jti)
+        return False
+
+    def _failed_recently(self):
+        return self._last_failure is not None and time.monotonic() - self._last_failure < INITIAL_SYNC_RETRY_SECONDS
+
+    def _failed(self, error):
+        self.last_error = str(error)
+        self._last_failure = time.monotonic()
+
+    def _lookup(self, jti):
+        """Ask Mongo directly; fails closed when the store is unreachable"""
+        if self._failed_recently():
+            return True
+        try:
+            found = self._collection().find_one({'_id': jti, 'expires_at': {'$gt': datetime.utcnow()}}, {'_id': 1})
+        except Exception as e:
+            self._failed(e)
+            print(f"Warning: Could not check revoked tokens, rejecting token: {e}")
+            return True
+        return found is not None
+
+    def sync(self):
+        """Pull revocations made since the last sync and prune expired ones"""
+        started = datetime.utcnow()
+        query = {'expires_at': {'$gt': started}}
+        if self.last_sync is not None:
+            query['revoked_at'] = {'$gte': self.last_sync - SYNC_OVERLAP}
+        try:
+            fresh = {doc['_id']: doc['expires_at'] for doc in self._collection().find(query, {'expires_at': 1})}
+        except Exception as e:
+            # Keep serving the set we have
+            self._failed(e)
+            print(f"Warning: Could not sync revoked tokens: {e}")
+            return False
+
+        with self._lock:
+            self._revoked.update(fresh)
+            for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= started]:
+                del self._revoked[jti]
+        self.last_sync = started
+        self.last_error = None
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        # Only the first caller loads the set; concurrent checks fall through to _lookup()
+        if not self._start_lock.acquire(blocking=False):
+            return
+        try:
+            if self._thread is None:
+                self.sync()
+                self._thread = threading.Thread(target=self._run, name='token-revocation-sync', daemon=True)
+                self._thread.start()
+                atexit.register(self._stop.set)
+        finally:
+            self._start_lock.release()
+
+    def _run(self):
+        while True:
+            interval = self.sync_seconds if self.last_sync is not None else INITIAL_SYNC_RETRY_SECONDS
+            if self._stop.wait(interval):
+                return
+            self.sync()
+
+    def stats(self):
+        return {
+            'revoked': len(self._revoked),
+            'last_sync': self.last_sync.isoformat() if self.last_sync else None,
+            'last_error': self.last_error,
+        }
+
+
+# Create a singleton instance
+token_revocations = TokenRevocationList()